@@ -0,0 +1,129 @@
+"""
+Benchmark: Dashboard Summary Query
+==================================
+Compares the legacy multi-query dashboard summary (DimTime lookup, sales
+aggregate, product count, two DimTime year lookups and two value sums) with
+the single-query version behind GET /api/dashboard-summary, under
+concurrent load. The result cache is bypassed; every call hits the database.
+
+Usage (from the backend directory):
+    python -m app.benchmark_dashboard_summary --month 11 --year 2025 --concurrency 1,8,32 --requests 500
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import settings
+from app.models_star_schema import DimTime, DimProduct, FactSales, FactProductPerformance
+from app.routers.api import clean_value, dashboard_summary_query, dashboard_summary_response
+
+
+def legacy_dashboard_summary(db: Session, month: int, year: int) -> dict:
+    """The dashboard summary as computed before the single-query rewrite"""
+    time_dim = db.query(DimTime).filter(DimTime.month == month, DimTime.year == year).first()
+    if not time_dim:
+        return {'month': month, 'year': year}
+    
+    sales_data = db.query(
+        func.count(FactSales.fact_id).label('count'),
+        func.sum(FactSales.sales_target).label('total_target'),
+        func.sum(FactSales.gross_sales).label('total_gross'),
+        func.sum(FactSales.net_sales).label('total_net'),
+        func.sum(FactSales.coll_target).label('coll_target'),
+        func.sum(FactSales.total_collection).label('total_coll'),
+        func.sum(FactSales.cash_collection).label('cash_coll'),
+        func.sum(FactSales.credit_collection).label('credit_coll'),
+        func.sum(FactSales.seed_collection).label('seed_coll')
+    ).filter(FactSales.time_id == time_dim.time_id).first()
+    
+    product_count = db.query(func.count(DimProduct.product_id)).filter(DimProduct.is_active == 1).scalar() or 0
+    
+    time_ids_current = [t.time_id for t in db.query(DimTime).filter(DimTime.year == year).all()]
+    value_current = clean_value(db.query(func.sum(FactProductPerformance.sales_value)).filter(
+        FactProductPerformance.time_id.in_(time_ids_current)
+    ).scalar()) if time_ids_current else 0
+    
+    time_ids_previous = [t.time_id for t in db.query(DimTime).filter(DimTime.year == year - 1).all()]
+    value_previous = clean_value(db.query(func.sum(FactProductPerformance.sales_value)).filter(
+        FactProductPerformance.time_id.in_(time_ids_previous)
+    ).scalar()) if time_ids_previous else 0
+    
+    return {
+        'total_regions': sales_data.count or 0,
+        'total_net_sales': clean_value(sales_data.total_net),
+        'total_collection': clean_value(sales_data.total_coll),
+        'total_products': product_count,
+        'total_value_current': value_current,
+        'total_value_previous': value_previous
+    }
+
+
+def single_query_dashboard_summary(db: Session, month: int, year: int) -> dict:
+    """The query and response of the current endpoint, without the result cache"""
+    row = db.execute(dashboard_summary_query(month, year)).one()
+    return dashboard_summary_response(row, month, year)
+
+
+def run(session_factory, summary, month: int, year: int, concurrency: int, requests: int) -> dict:
+    """Run `requests` calls on `concurrency` threads, each with its own session"""
+    def call(_):
+        db = session_factory()
+        try:
+            start = time.perf_counter()
+            summary(db, month, year)
+            return (time.perf_counter() - start) * 1000
+        finally:
+            db.close()
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - start
+    
+    return {
+        'mean': statistics.mean(latencies),
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'throughput': requests / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard summary query")
+    parser.add_argument('--month', type=int, default=11)
+    parser.add_argument('--year', type=int, default=2025)
+    parser.add_argument('--concurrency', default='1,8,32', help="Comma separated thread counts")
+    parser.add_argument('--requests', type=int, default=500, help="Calls per run")
+    parser.add_argument('--database-url', default=settings.DATABASE_URL)
+    args = parser.parse_args()
+    
+    levels = [int(level) for level in args.concurrency.split(',')]
+    engine = create_engine(args.database_url, pool_size=max(levels), max_overflow=0)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    
+    # Both versions must agree before timing them
+    with session_factory() as db:
+        legacy = legacy_dashboard_summary(db, args.month, args.year)
+        current = single_query_dashboard_summary(db, args.month, args.year)
+    if 'total_regions' in legacy:
+        flattened = {**current['sales'], **current['collection'], **current['products']}
+        assert all(flattened[key] == value for key, value in legacy.items()), "Results differ"
+    
+    print("=" * 72)
+    print(f"DASHBOARD SUMMARY BENCHMARK  {args.month}/{args.year}  {args.requests} calls per run")
+    print("=" * 72)
+    print(f"{'version':<14}{'threads':>8}{'mean ms':>11}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>12}")
+    for concurrency in levels:
+        for name, summary in [('legacy', legacy_dashboard_summary), ('single-query', single_query_dashboard_summary)]:
+            stats = run(session_factory, summary, args.month, args.year, concurrency, args.requests)
+            print(f"{name:<14}{concurrency:>8}{stats['mean']:>11.2f}{stats['p50']:>10.2f}"
+                  f"{stats['p95']:>10.2f}{stats['throughput']:>12.1f}")
+    
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,8 +13,45 @@ class Settings:
     
     # PostgreSQL connection - URL encode password to handle special characters like @
     DATABASE_URL: str = f"postgresql+psycopg2://{DB_USER}:{quote_plus(DB_PASSWORD)}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    ASYNC_DATABASE_URL: str = f"postgresql+asyncpg://{DB_USER}:{quote_plus(DB_PASSWORD)}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    
+    # Connection pool of each engine (sync and async), per uvicorn worker
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    
+    # Storage of fact measures: float, numeric (NUMERIC(18, 2)) or minor_units
+    # (BIGINT paisa, percentages as INTEGER hundredths). Switching an existing
+    # database requires python -m app.migrate_measure_storage --to <storage>
+    MEASURE_STORAGE: str = os.getenv("MEASURE_STORAGE", "float")
+    
+    # Log every SQL statement (development only)
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
     
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", 8000))
+    
+    # Background upload processing
+    UPLOAD_WORKERS: int = int(os.getenv("UPLOAD_WORKERS", 2))
+    UPLOAD_JOB_HISTORY: int = int(os.getenv("UPLOAD_JOB_HISTORY", 200))
+    
+    # Worker processes used to parse the workbooks of a batch upload
+    BATCH_PARSE_WORKERS: int = int(os.getenv("BATCH_PARSE_WORKERS", os.cpu_count() or 1))
+    
+    # Dashboard/analytics result cache (TTL in seconds, 0 disables)
+    RESULT_CACHE_TTL: float = float(os.getenv("RESULT_CACHE_TTL", 300))
+    RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 512))
+    
+    # Rows fetched per server-side cursor round trip by the export endpoints
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", 5000))
+    
+    # Calendar pre-generated into dim_time at startup (and dim_date when daily)
+    CALENDAR_START_YEAR: int = int(os.getenv("CALENDAR_START_YEAR", 2020))
+    CALENDAR_END_YEAR: int = int(os.getenv("CALENDAR_END_YEAR", 2030))
+    CALENDAR_DAILY: bool = os.getenv("CALENDAR_DAILY", "false").lower() in ("1", "true", "yes")
+    # Seconds between refreshes of the is_current_month / is_current_year flags
+    CALENDAR_REFRESH_INTERVAL: float = float(os.getenv("CALENDAR_REFRESH_INTERVAL", 3600))
 
 settings = Settings()
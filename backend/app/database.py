@@ -1,12 +1,94 @@
+import threading
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from app.config import settings
 
+
+class PoolWaitMetrics:
+    """
+    Pool mixin counting checkouts that found every connection in use (and
+    no overflow left), so they had to wait for a checkin, and how long
+    they waited.
+    """
+
+    def __init__(self, *args, pool_size: int = 5, max_overflow: int = 10, **kwargs):
+        super().__init__(*args, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+        self.connection_limit = pool_size + max_overflow if max_overflow >= 0 else None
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self._metrics_lock = threading.Lock()
+
+    def _do_get(self):
+        exhausted = (self.connection_limit is not None and self.checkedin() == 0
+                     and self.checkedout() >= self.connection_limit)
+        if not exhausted:
+            return super()._do_get()
+        
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            with self._metrics_lock:
+                self.waits += 1
+                self.wait_seconds += time.perf_counter() - start
+                self.timeouts += int(timed_out)
+
+
+class MeteredQueuePool(PoolWaitMetrics, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(PoolWaitMetrics, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(poolclass) -> dict:
+    """Pool and logging options shared by the sync and async engines"""
+    return {
+        'poolclass': poolclass,
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+        'echo': settings.DB_ECHO,
+    }
+
+
+def pool_stats(pool) -> dict:
+    """Current usage of an engine's connection pool"""
+    return {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'connection_limit': pool.connection_limit,
+        'waits': pool.waits,
+        'wait_seconds': round(pool.wait_seconds, 3),
+        'timeouts': pool.timeouts
+    }
+
+
 # PostgreSQL connection
-engine = create_engine(settings.DATABASE_URL, echo=True)
+engine = create_engine(settings.DATABASE_URL, **engine_options(MeteredQueuePool))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async connection (asyncpg) for the read endpoints
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, **engine_options(MeteredAsyncQueuePool))
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -15,3 +97,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,12 +1,28 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from app.database import engine, async_engine, Base, SessionLocal, pool_stats
 from app.routers import api
 from app.config import settings
+from app.services.data_versions import ensure_versions
+from app.services.sales_aggregates import backfill_sales_aggregates
+from app.services.dimension_cache import ensure_unique_members
+from app.services.calendar_dimension import generate_calendar, refresh_current_flags
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# Seed the per-table data versions used for ETags, add the natural-key
+# indexes uploads insert against, pre-generate the calendar (so uploads never
+# insert dim_time rows) and build missing sales rollups
+with SessionLocal() as db:
+    ensure_versions(db)
+    ensure_unique_members(db)
+    generate_calendar(db, settings.CALENDAR_START_YEAR, settings.CALENDAR_END_YEAR, daily=settings.CALENDAR_DAILY)
+    refresh_current_flags(db)
+    backfill_sales_aggregates(db)
+
 app = FastAPI(
     title="Surovi Agro Industries Dashboard API",
     description="API for Sales & Collection Dashboard",
@@ -20,12 +36,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Total-Count", "X-Next-Cursor"],
 )
 
 # Include routers
 app.include_router(api.router, prefix="/api", tags=["API"])
 
 
+def refresh_calendar_flags():
+    with SessionLocal() as db:
+        refresh_current_flags(db)
+
+
+async def refresh_calendar_flags_periodically():
+    """Keep is_current_month / is_current_year right across month and year boundaries"""
+    while True:
+        await asyncio.sleep(settings.CALENDAR_REFRESH_INTERVAL)
+        try:
+            await run_in_threadpool(refresh_calendar_flags)
+        except Exception as e:
+            print(f"Calendar flag refresh failed: {e}")
+
+
+@app.on_event("startup")
+async def start_calendar_refresh():
+    if settings.CALENDAR_REFRESH_INTERVAL > 0:
+        app.state.calendar_refresh = asyncio.create_task(refresh_calendar_flags_periodically())
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    calendar_refresh = getattr(app.state, 'calendar_refresh', None)
+    if calendar_refresh:
+        calendar_refresh.cancel()
+    await async_engine.dispose()
+
+
 @app.get("/")
 def root():
     return {
@@ -40,6 +86,15 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/pool")
+def pool_health():
+    """Connection pool usage of the sync (uploads) and async (reads) engines in this worker"""
+    return {
+        "sync": pool_stats(engine.pool),
+        "async": pool_stats(async_engine.pool)
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host=settings.API_HOST, port=settings.API_PORT)
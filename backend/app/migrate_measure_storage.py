@@ -0,0 +1,147 @@
+"""
+Migration Script: Change the Storage of Fact Measures
+=====================================================
+Converts every Amount / Percent column of the fact and aggregate tables to
+another measure storage (MEASURE_STORAGE in config) in place:
+- float:       double precision
+- numeric:     NUMERIC(18, 2) amounts, NUMERIC(12, 2) percentages
+- minor_units: BIGINT hundredths of amounts (paisa), INTEGER hundredths
+               of a percent
+
+Each table is rewritten once by a single ALTER TABLE with one
+ALTER COLUMN ... TYPE ... USING per measure, and all tables change in one
+transaction. NULL, NaN and infinite values become 0 and values are rounded
+half away from zero to two decimals, exactly as the Amount / Percent types
+write them. PostgreSQL only.
+
+Set MEASURE_STORAGE to the new storage before restarting the API.
+
+Usage (from the backend directory):
+    python -m app.migrate_measure_storage --to minor_units
+"""
+
+import argparse
+from typing import Dict, List
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from app.database import engine
+from app.models_star_schema import Base as StarBase, Amount, MEASURE_STORAGES
+from app.services.data_versions import bump_versions, FACT_TABLES
+
+
+# information_schema.columns.data_type -> measure storage
+STORAGE_OF_DATA_TYPE = {
+    'double precision': 'float',
+    'real': 'float',
+    'numeric': 'numeric',
+    'bigint': 'minor_units',
+    'integer': 'minor_units',
+}
+
+
+def measure_columns() -> Dict[str, list]:
+    """Amount / Percent columns of every star schema table, by table name"""
+    columns = {}
+    for table in StarBase.metadata.sorted_tables:
+        measures = [column for column in table.columns if isinstance(column.type, Amount)]
+        if measures:
+            columns[table.name] = measures
+    return columns
+
+
+def stored_storages(db: Session, table_names: List[str]) -> Dict[tuple, str]:
+    """Current storage of each (table, column) in the database"""
+    rows = db.execute(text(
+        "SELECT table_name, column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = ANY(:tables)"
+    ), {'tables': table_names}).all()
+    return {(table, column): STORAGE_OF_DATA_TYPE.get(data_type) for table, column, data_type in rows}
+
+
+def value_sql(column: str, storage: str, scale: int) -> str:
+    """NUMERIC value of a column in the given storage, 0 for NULL / NaN / infinity"""
+    if storage == 'float':
+        return f"CASE WHEN {column} IS NULL OR {column} IN ('NaN', 'Infinity', '-Infinity') THEN 0 ELSE {column}::numeric END"
+    if storage == 'numeric':
+        return f"CASE WHEN {column} IS NULL OR {column} = 'NaN' THEN 0 ELSE {column} END"
+    return f"COALESCE({column}, 0)::numeric / {scale}"
+
+
+def convert_sql(column, source: str, target: str, dialect) -> str:
+    """ALTER COLUMN clause converting a measure column from source to target storage"""
+    measure_type = column.type.__class__(storage=target)
+    value = value_sql(column.name, source, measure_type.scale)
+    if target == 'float':
+        using = f"({value})::double precision"
+    else:
+        units = f"round(({value}) * {measure_type.scale})"
+        if measure_type.max_units is not None:
+            units = f"greatest(least({units}, {measure_type.max_units}), -{measure_type.max_units})"
+        using = units if target == 'minor_units' else f"{units} / {measure_type.scale}"
+    return f"ALTER COLUMN {column.name} TYPE {measure_type.compile(dialect=dialect)} USING {using}"
+
+
+def convert_measure_storage(db: Session, target: str, dry_run: bool = False) -> List[str]:
+    """
+    Convert all measure columns not yet in the target storage and commit.
+    Returns the executed (or, with dry_run, planned) statements.
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name != 'postgresql':
+        raise ValueError(f"Measure storage migration is not supported on {dialect.name}")
+    
+    columns = measure_columns()
+    storages = stored_storages(db, list(columns))
+    
+    statements = []
+    for table_name, measures in columns.items():
+        clauses = []
+        for column in measures:
+            source = storages.get((table_name, column.name))
+            if source is None:
+                raise ValueError(f"Unknown storage of {table_name}.{column.name}")
+            if source != target:
+                clauses.append(convert_sql(column, source, target, dialect))
+        if clauses:
+            statements.append(f"ALTER TABLE {table_name}\n    " + ",\n    ".join(clauses))
+    
+    if dry_run or not statements:
+        return statements
+    
+    for statement in statements:
+        print(f"\n{statement}")
+        db.execute(text(statement))
+    # Values are rounded to the new storage, so cached reads are stale
+    bump_versions(db, FACT_TABLES)
+    db.commit()
+    return statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the fact measure columns to another storage")
+    parser.add_argument('--to', dest='target', choices=MEASURE_STORAGES, required=True,
+                        help="float, numeric (NUMERIC(18, 2)) or minor_units (BIGINT paisa)")
+    parser.add_argument('--dry-run', action='store_true', help="Print the statements without running them")
+    parser.add_argument('--database-url', default=None, help="Defaults to the configured database")
+    args = parser.parse_args()
+    
+    bind = create_engine(args.database_url) if args.database_url else engine
+    with Session(bind) as db:
+        try:
+            statements = convert_measure_storage(db, args.target, args.dry_run)
+        except Exception as e:
+            print(f"\n❌ Error converting measures: {e}")
+            db.rollback()
+            raise
+    
+    if not statements:
+        print(f"✅ All measures are already stored as {args.target}")
+    elif args.dry_run:
+        print("\n\n".join(statements))
+    else:
+        print(f"\n✅ Converted {len(statements)} tables to {args.target} measures. "
+              f"Set MEASURE_STORAGE={args.target} and restart the API.")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,24 +5,57 @@ Run this script to:
 1. Create the star schema tables
 2. Populate dimension tables
 3. Populate fact tables from existing data
+
+After the facts, a year-over-year stage aligns every product fact with the
+same product and month of the previous year and fills in prev_year_value /
+prev_year_volume and the growth columns for the whole table.
+
+Two modes:
+- bulk (default): set-based. Legacy rows are read per period into
+  DataFrames, keys are resolved with merges against the dimension tables,
+  and new facts are written in batches with the fact writer. Every
+  (fact table, period) chunk commits on its own with a checkpoint in
+  migration_checkpoint, so a failed run resumes where it stopped (and
+  re-runs done periods whose legacy rows changed since), and chunks can
+  run in several worker processes (--workers).
+- row: the original row-by-row migration (several queries per record).
+
+Usage (from the backend directory):
+    python -m app.migrate_to_star_schema --mode bulk --write-mode auto --workers 4
 """
 
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import date
-from sqlalchemy.orm import Session
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, select, update, delete, func
+from sqlalchemy.orm import Session, sessionmaker
 from app.database import engine, SessionLocal
 from app.models import Region, Product, SalesMonthly, CollectionMonthly, ProductSalesValue, ProductSalesVolume
 from app.models_star_schema import (
     Base as StarBase,
     DimTime, DimRegion, DimProduct,
-    FactSales, FactProductPerformance,
+    FactSales, FactProductPerformance, MigrationCheckpoint,
     get_month_name, get_month_short, get_quarter, get_fiscal_year
 )
+from app.services.fact_writer import write_fact_rows, iter_batches, WRITE_MODES, DEFAULT_WRITE_MODE, BATCH_SIZE
+from app.services.sales_aggregates import refresh_sales_aggregates
+from app.services.file_processor import percentage
+from app.services.data_versions import bump_versions, TRACKED_TABLES
+from app.services.calendar_dimension import generate_calendar
+
 
+MIGRATION_MODES = ['bulk', 'row']
 
-def create_star_schema_tables():
+
+def create_star_schema_tables(bind=engine):
     """Create all star schema tables"""
     print("Creating star schema tables...")
-    StarBase.metadata.create_all(bind=engine)
+    StarBase.metadata.create_all(bind=bind)
     print("✅ Star schema tables created")
 
 
@@ -154,6 +187,7 @@ def populate_fact_sales(db: Session):
     # Get all sales records
     sales_records = db.query(SalesMonthly).all()
     count = 0
+    time_ids = set()
     
     for sales in sales_records:
         # Get corresponding time dimension
@@ -169,7 +203,7 @@ def populate_fact_sales(db: Session):
         old_region = db.query(Region).filter(Region.region_id == sales.region_id).first()
         if not old_region:
             continue
-            
+        
         region_dim = db.query(DimRegion).filter(
             DimRegion.area_name == old_region.area_name
         ).first()
@@ -225,7 +259,10 @@ def populate_fact_sales(db: Session):
         )
         db.add(fact)
         count += 1
+        time_ids.add(time_dim.time_id)
     
+    db.flush()
+    refresh_sales_aggregates(db, time_ids)
     db.commit()
     print(f"✅ Added {count} fact_sales records")
 
@@ -243,7 +280,7 @@ def populate_fact_product_performance(db: Session):
         old_product = db.query(Product).filter(Product.product_id == value_rec.product_id).first()
         if not old_product:
             continue
-            
+        
         product_dim = db.query(DimProduct).filter(
             DimProduct.product_name == old_product.product_name
         ).first()
@@ -279,8 +316,7 @@ def populate_fact_product_performance(db: Session):
         sales_value = value_rec.sales_value or 0
         sales_volume = volume_rec.sales_volume if volume_rec else 0
         
-        # For YoY, we'd need previous year data - set to 0 for now
-        # In production, query previous year's data
+        # Previous year figures are filled in afterwards by backfill_year_over_year
         prev_value = 0
         prev_volume = 0
         
@@ -308,31 +344,479 @@ def populate_fact_product_performance(db: Session):
     print(f"✅ Added {count} fact_product_performance records")
 
 
-def run_migration():
-    """Run full migration to star schema"""
+# ==================== SET-BASED MIGRATION ====================
+
+def read_frame(db: Session, query) -> pd.DataFrame:
+    """Run a SELECT in the session's transaction and return the rows as a DataFrame"""
+    return pd.read_sql(query, db.connection())
+
+
+def without_existing(facts: pd.DataFrame, existing: pd.DataFrame, key_columns: list) -> pd.DataFrame:
+    """Drop facts whose key is already stored (and repeated keys, keeping the first)"""
+    facts = facts.drop_duplicates(key_columns)
+    merged = facts.merge(existing[key_columns].drop_duplicates(), on=key_columns, how='left', indicator=True)
+    return merged[merged['_merge'] == 'left_only'].drop(columns='_merge')
+
+
+def time_keys(db: Session) -> pd.DataFrame:
+    """(month, year) -> time_id"""
+    times = read_frame(db, select(DimTime.time_id, DimTime.month, DimTime.year).order_by(DimTime.time_id))
+    return times.drop_duplicates(['month', 'year'])
+
+
+def populate_dim_time_bulk(db: Session, start_year: int = 2023, end_year: int = 2026):
+    """Insert the missing months of the time dimension in one statement"""
+    print("\nPopulating dim_time (set-based)...")
+    
+    added = generate_calendar(db, start_year, end_year)
+    print(f"✅ Added {added['dim_time']} time dimension records")
+
+
+def populate_dim_region_bulk(db: Session):
+    """Insert legacy regions whose area name is not in dim_region yet"""
+    print("\nPopulating dim_region (set-based)...")
+    
+    regions = read_frame(db, select(Region.area_code, Region.area_name, Region.division).order_by(Region.region_id))
+    existing = set(db.execute(select(DimRegion.area_name)).scalars())
+    regions = regions[~regions['area_name'].isin(existing)].drop_duplicates('area_name')
+    
+    rows = [{
+        'area_code': region['area_code'],
+        'area_name': region['area_name'],
+        'division': region['division'],
+        'zone': determine_zone(region['division']),
+        'region_type': 'Area',
+        'is_active': 1
+    } for region in regions.replace({np.nan: None}).to_dict('records')]
+    
+    if rows:
+        db.execute(DimRegion.__table__.insert(), rows)
+    db.commit()
+    print(f"✅ Added {len(rows)} region dimension records")
+
+
+def populate_dim_product_bulk(db: Session):
+    """Insert legacy products whose name is not in dim_product yet"""
+    print("\nPopulating dim_product (set-based)...")
+    
+    products = read_frame(db, select(Product.product_name, Product.product_category).order_by(Product.product_id))
+    existing = set(db.execute(select(DimProduct.product_name)).scalars())
+    products = products[~products['product_name'].isin(existing)].drop_duplicates('product_name')
+    
+    rows = [{
+        'product_name': product['product_name'],
+        'product_category': product['product_category'] or 'General',
+        'product_group': product['product_category'],
+        'is_active': 1
+    } for product in products.replace({np.nan: None}).to_dict('records')]
+    
+    if rows:
+        db.execute(DimProduct.__table__.insert(), rows)
+    db.commit()
+    print(f"✅ Added {len(rows)} product dimension records")
+
+
+def legacy_region_keys(db: Session) -> pd.DataFrame:
+    """Legacy region_id -> dim_region region_id, matched on area name"""
+    legacy = read_frame(db, select(Region.region_id, Region.area_name))
+    dims = read_frame(db, select(DimRegion.region_id.label('dim_region_id'), DimRegion.area_name)
+                      .order_by(DimRegion.region_id)).drop_duplicates('area_name')
+    return legacy.merge(dims, on='area_name')[['region_id', 'dim_region_id']]
+
+
+def legacy_product_keys(db: Session) -> pd.DataFrame:
+    """Legacy product_id -> dim_product product_id, matched on product name"""
+    legacy = read_frame(db, select(Product.product_id, Product.product_name))
+    dims = read_frame(db, select(DimProduct.product_id.label('dim_product_id'), DimProduct.product_name)
+                      .order_by(DimProduct.product_id)).drop_duplicates('product_name')
+    return legacy.merge(dims, on='product_name')[['product_id', 'dim_product_id']]
+
+
+def in_period(query, month_column, year_column, period: Optional[Tuple[int, int]]):
+    """Restrict a query to one (month, year), or leave it unchanged if period is None"""
+    if period is None:
+        return query
+    month, year = period
+    return query.where(month_column == month, year_column == year)
+
+
+def sales_fact_frame(db: Session, period: Optional[Tuple[int, int]] = None) -> pd.DataFrame:
+    """
+    New fact_sales rows for the legacy sales (of one period if given):
+    sales_monthly joined with its collection_monthly record, dim_time and
+    dim_region, minus stored facts.
+    """
+    sales = read_frame(db, in_period(select(
+        SalesMonthly.region_id, SalesMonthly.month, SalesMonthly.year,
+        SalesMonthly.sales_target, SalesMonthly.gross_sales, SalesMonthly.sales_return, SalesMonthly.net_sales
+    ), SalesMonthly.month, SalesMonthly.year, period))
+    collections = read_frame(db, in_period(select(
+        CollectionMonthly.region_id, CollectionMonthly.month, CollectionMonthly.year,
+        CollectionMonthly.coll_target, CollectionMonthly.total_coll, CollectionMonthly.cash_coll,
+        CollectionMonthly.credit_coll, CollectionMonthly.seed_coll
+    ), CollectionMonthly.month, CollectionMonthly.year, period)).drop_duplicates(['region_id', 'month', 'year'])
+    existing = read_frame(db, in_period(
+        select(FactSales.region_id, FactSales.time_id).join(DimTime, FactSales.time_id == DimTime.time_id),
+        DimTime.month, DimTime.year, period
+    ))
+    
+    facts = sales.merge(time_keys(db), on=['month', 'year']).merge(legacy_region_keys(db), on='region_id')
+    facts = facts.merge(collections, on=['region_id', 'month', 'year'], how='left')
+    facts = facts.drop(columns='region_id').rename(columns={'dim_region_id': 'region_id'})
+    facts = without_existing(facts, existing, ['region_id', 'time_id'])
+    
+    measures = ['sales_target', 'gross_sales', 'sales_return', 'net_sales',
+                'coll_target', 'total_coll', 'cash_coll', 'credit_coll', 'seed_coll']
+    facts[measures] = facts[measures].astype(float).fillna(0)
+    
+    return pd.DataFrame({
+        'region_id': facts['region_id'].to_numpy(),
+        'time_id': facts['time_id'].to_numpy(),
+        'sales_target': facts['sales_target'].to_numpy(),
+        'gross_sales': facts['gross_sales'].to_numpy(),
+        'sales_return': facts['sales_return'].to_numpy(),
+        'net_sales': facts['net_sales'].to_numpy(),
+        'sales_achievement_pct': percentage(facts['net_sales'].to_numpy(), facts['sales_target'].to_numpy()),
+        'coll_target': facts['coll_target'].to_numpy(),
+        'total_collection': facts['total_coll'].to_numpy(),
+        'cash_collection': facts['cash_coll'].to_numpy(),
+        'credit_collection': facts['credit_coll'].to_numpy(),
+        'seed_collection': facts['seed_coll'].to_numpy(),
+        'coll_achievement_pct': percentage(facts['total_coll'].to_numpy(), facts['coll_target'].to_numpy()),
+        'outstanding': (facts['net_sales'] - facts['total_coll']).to_numpy(),
+        'return_rate_pct': percentage(facts['sales_return'].to_numpy(), facts['gross_sales'].to_numpy())
+    })
+
+
+def product_fact_frame(db: Session, period: Optional[Tuple[int, int]] = None) -> pd.DataFrame:
+    """
+    New fact_product_performance rows for the legacy product values (of one
+    period end if given): product_sales_value joined with its
+    product_sales_volume record, dim_time (period end) and dim_product,
+    minus stored facts.
+    """
+    values = read_frame(db, in_period(select(
+        ProductSalesValue.product_id,
+        ProductSalesValue.period_end_month.label('month'),
+        ProductSalesValue.period_end_year.label('year'),
+        ProductSalesValue.sales_value
+    ), ProductSalesValue.period_end_month, ProductSalesValue.period_end_year, period))
+    volumes = read_frame(db, in_period(select(
+        ProductSalesVolume.product_id,
+        ProductSalesVolume.period_end_month.label('month'),
+        ProductSalesVolume.period_end_year.label('year'),
+        ProductSalesVolume.sales_volume
+    ), ProductSalesVolume.period_end_month, ProductSalesVolume.period_end_year, period)).drop_duplicates(
+        ['product_id', 'month', 'year']
+    )
+    existing = read_frame(db, in_period(
+        select(FactProductPerformance.product_id, FactProductPerformance.time_id)
+        .join(DimTime, FactProductPerformance.time_id == DimTime.time_id),
+        DimTime.month, DimTime.year, period
+    ))
+    
+    facts = values.merge(legacy_product_keys(db), on='product_id').merge(time_keys(db), on=['month', 'year'])
+    facts = facts.merge(volumes, on=['product_id', 'month', 'year'], how='left')
+    facts = facts.drop(columns='product_id').rename(columns={'dim_product_id': 'product_id'})
+    facts = without_existing(facts, existing, ['product_id', 'time_id'])
+    
+    sales_value = facts['sales_value'].astype(float).fillna(0).to_numpy()
+    sales_volume = facts['sales_volume'].astype(float).fillna(0).to_numpy()
+    zeros = np.zeros(len(facts))
+    
+    # Previous year figures are filled in afterwards by backfill_year_over_year
+    return pd.DataFrame({
+        'product_id': facts['product_id'].to_numpy(),
+        'time_id': facts['time_id'].to_numpy(),
+        'sales_value': sales_value,
+        'sales_volume': sales_volume,
+        'prev_year_value': zeros,
+        'prev_year_volume': zeros,
+        'value_growth': sales_value,
+        'volume_growth': sales_volume,
+        'value_growth_pct': zeros,
+        'volume_growth_pct': zeros
+    })
+
+
+# ==================== CHUNKED MIGRATION ====================
+
+# Fact stages of the set-based migration, each split into one chunk per legacy period
+FACT_STAGES = ['fact_sales', 'fact_product_performance']
+
+# Session factory of the process running chunks (see init_worker)
+_chunk_sessions = None
+
+
+def legacy_period_columns(stage: str) -> tuple:
+    """(month, year) columns of the legacy rows a stage migrates"""
+    if stage == 'fact_sales':
+        return SalesMonthly.month, SalesMonthly.year
+    return ProductSalesValue.period_end_month, ProductSalesValue.period_end_year
+
+
+def legacy_periods(db: Session, stage: str) -> Dict[Tuple[int, int], int]:
+    """Number of legacy rows a stage migrates per (month, year) period, oldest first"""
+    month_column, year_column = legacy_period_columns(stage)
+    counts = db.execute(
+        select(month_column, year_column, func.count()).group_by(month_column, year_column)
+    ).all()
+    return {(month, year): rows for month, year, rows in sorted(counts, key=lambda row: (row[1], row[0]))}
+
+
+def legacy_row_count(db: Session, stage: str, month: int, year: int) -> int:
+    """Number of legacy rows a stage migrates for one period"""
+    month_column, year_column = legacy_period_columns(stage)
+    return db.execute(
+        select(func.count()).where(month_column == month, year_column == year)
+    ).scalar_one()
+
+
+def migrate_chunk(db: Session, stage: str, month: int, year: int, write_mode: str = DEFAULT_WRITE_MODE) -> int:
+    """Write the new facts of one stage and period (the caller commits). Returns the number of rows."""
+    if stage == 'fact_sales':
+        facts = sales_fact_frame(db, (month, year))
+        count = write_fact_rows(db, FactSales, facts.to_dict('records'), write_mode)
+        refresh_sales_aggregates(db, facts['time_id'].unique().tolist())
+        return count
+    
+    facts = product_fact_frame(db, (month, year))
+    return write_fact_rows(db, FactProductPerformance, facts.to_dict('records'), write_mode)
+
+
+def record_checkpoint(db: Session, stage: str, month: int, year: int, status: str, rows_written: int = 0,
+                      seconds: float = None, error: str = None, legacy_rows: int = None) -> None:
+    """Create or update the checkpoint of a chunk (the caller commits)"""
+    checkpoint = db.execute(select(MigrationCheckpoint).where(
+        MigrationCheckpoint.stage == stage, MigrationCheckpoint.month == month, MigrationCheckpoint.year == year
+    )).scalar_one_or_none()
+    if checkpoint is None:
+        checkpoint = MigrationCheckpoint(stage=stage, month=month, year=year)
+        db.add(checkpoint)
+    
+    checkpoint.status = status
+    checkpoint.rows_written = rows_written
+    checkpoint.legacy_rows = legacy_rows
+    checkpoint.seconds = seconds
+    checkpoint.error = error
+
+
+def pending_chunks(db: Session, restart: bool = False) -> List[Tuple[str, int, int]]:
+    """
+    (stage, month, year) chunks without a done checkpoint, or whose legacy
+    row count differs from the one recorded when the chunk was done (chunks
+    only add missing facts, so running one again is safe). restart clears
+    all checkpoints first.
+    """
+    if restart:
+        db.execute(delete(MigrationCheckpoint))
+        db.commit()
+    
+    done = {(stage, month, year): legacy_rows for stage, month, year, legacy_rows in db.execute(select(
+        MigrationCheckpoint.stage, MigrationCheckpoint.month, MigrationCheckpoint.year, MigrationCheckpoint.legacy_rows
+    ).where(MigrationCheckpoint.status == 'done'))}
+    
+    return [(stage, month, year) for stage in FACT_STAGES
+            for (month, year), legacy_rows in legacy_periods(db, stage).items()
+            if done.get((stage, month, year)) != legacy_rows]
+
+
+def init_worker(database_url: Optional[str] = None) -> None:
+    """Set up the sessions of a chunk-running process (its own engine if database_url is given)"""
+    global _chunk_sessions
+    if database_url:
+        _chunk_sessions = sessionmaker(bind=create_engine(database_url), autocommit=False, autoflush=False)
+    else:
+        _chunk_sessions = SessionLocal
+
+
+def run_chunk(stage: str, month: int, year: int, write_mode: str = DEFAULT_WRITE_MODE) -> Dict[str, Any]:
+    """
+    Migrate one chunk in its own transaction, committed together with its
+    done checkpoint and the version bump of its fact table. A failed chunk
+    is rolled back and checkpointed as failed so the next run retries it.
+    """
+    db = _chunk_sessions()
+    started = time.perf_counter()
+    result = {'stage': stage, 'month': month, 'year': year, 'rows': 0, 'error': None}
+    
+    try:
+        # Counted before reading, so rows added meanwhile make the next run check the period again
+        legacy_rows = legacy_row_count(db, stage, month, year)
+        result['rows'] = migrate_chunk(db, stage, month, year, write_mode)
+        result['seconds'] = time.perf_counter() - started
+        record_checkpoint(db, stage, month, year, 'done', result['rows'], result['seconds'],
+                          legacy_rows=legacy_rows)
+        if result['rows']:
+            # Readers cache by table version; bump it with the facts it covers
+            bump_versions(db, [stage])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        result['seconds'] = time.perf_counter() - started
+        result['error'] = str(e)
+        record_checkpoint(db, stage, month, year, 'failed', seconds=result['seconds'], error=str(e))
+        db.commit()
+    finally:
+        db.close()
+    
+    return result
+
+
+def run_chunks(chunks: List[Tuple[str, int, int]], write_mode: str = DEFAULT_WRITE_MODE,
+               workers: int = 1, database_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run chunks in this process (workers=1) or in a pool of worker processes,
+    printing progress and throughput as chunks finish.
+    """
+    print(f"\nMigrating {len(chunks)} fact chunks with {workers} worker(s)...")
+    started = time.perf_counter()
+    rows = 0
+    failed = []
+    
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                                   initializer=init_worker, initargs=(database_url,))
+        futures = [pool.submit(run_chunk, *chunk, write_mode) for chunk in chunks]
+        results = (future.result() for future in as_completed(futures))
+    else:
+        init_worker(database_url)
+        results = (run_chunk(*chunk, write_mode) for chunk in chunks)
+    
+    try:
+        for done, result in enumerate(results, 1):
+            elapsed = time.perf_counter() - started
+            label = f"[{done}/{len(chunks)}] {result['stage']} {result['year']}-{result['month']:02d}"
+            if result['error']:
+                failed.append(result)
+                print(f"  ❌ {label}: {result['error']}")
+                continue
+            rows += result['rows']
+            print(f"  {label}: {result['rows']} rows in {result['seconds']:.2f}s "
+                  f"(total {rows} rows, {rows / elapsed if elapsed else 0:.0f} rows/s)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    
+    elapsed = time.perf_counter() - started
+    print(f"✅ {len(chunks) - len(failed)} chunks, {rows} fact rows in {elapsed:.1f}s"
+          + (f", {len(failed)} failed (re-run to resume)" if failed else ""))
+    return {'chunks': len(chunks), 'rows': rows, 'failed': failed, 'seconds': elapsed}
+
+
+# ==================== YEAR-OVER-YEAR BACKFILL ====================
+
+YOY_COLUMNS = [
+    'prev_year_value', 'prev_year_volume', 'value_growth', 'volume_growth', 'value_growth_pct', 'volume_growth_pct'
+]
+
+
+def year_over_year_frame(db: Session) -> pd.DataFrame:
+    """
+    YoY columns of every product fact that has a fact for the same product
+    and month one year earlier, aligned with a single self-merge of the
+    fact table (keyed on product, month, year). Only rows whose stored
+    values differ are returned.
+    """
+    facts = read_frame(db, select(
+        FactProductPerformance.fact_id, FactProductPerformance.product_id, DimTime.month, DimTime.year,
+        FactProductPerformance.sales_value, FactProductPerformance.sales_volume,
+        *[getattr(FactProductPerformance, column) for column in YOY_COLUMNS]
+    ).join(DimTime, FactProductPerformance.time_id == DimTime.time_id))
+    
+    previous = facts[['product_id', 'month', 'year', 'sales_value', 'sales_volume']].rename(
+        columns={'sales_value': 'value_prev', 'sales_volume': 'volume_prev'}
+    )
+    previous['year'] += 1
+    aligned = facts.merge(previous, on=['product_id', 'month', 'year'])
+    
+    value = aligned['sales_value'].astype(float).fillna(0)
+    volume = aligned['sales_volume'].astype(float).fillna(0)
+    value_prev = aligned['value_prev'].astype(float).fillna(0)
+    volume_prev = aligned['volume_prev'].astype(float).fillna(0)
+    
+    computed = pd.DataFrame({
+        'fact_id': aligned['fact_id'],
+        'prev_year_value': value_prev,
+        'prev_year_volume': volume_prev,
+        'value_growth': value - value_prev,
+        'volume_growth': volume - volume_prev,
+        'value_growth_pct': percentage((value - value_prev).to_numpy(), value_prev.to_numpy()),
+        'volume_growth_pct': percentage((volume - volume_prev).to_numpy(), volume_prev.to_numpy())
+    })
+    
+    # Measures are stored to 2 decimals, so compare at that precision exactly
+    stored = aligned[YOY_COLUMNS].astype(float).fillna(0).round(2).to_numpy()
+    changed = (computed[YOY_COLUMNS].round(2).to_numpy() != stored).any(axis=1)
+    return computed[changed]
+
+
+def backfill_year_over_year(db: Session) -> int:
+    """Fill prev_year_* and growth columns of fact_product_performance in bulk. Returns the updated rows."""
+    print("\nBackfilling year-over-year comparison...")
+    
+    updates = year_over_year_frame(db)
+    for batch in iter_batches(updates.to_dict('records'), BATCH_SIZE):
+        db.execute(update(FactProductPerformance), batch)
+    if len(updates):
+        bump_versions(db, ['fact_product_performance'])
+    
+    db.commit()
+    print(f"✅ Updated {len(updates)} fact_product_performance records with previous year figures")
+    return len(updates)
+
+
+def run_migration(mode: str = 'bulk', write_mode: str = DEFAULT_WRITE_MODE, workers: int = 1,
+                  restart: bool = False, database_url: Optional[str] = None):
+    """
+    Run full migration to star schema. In bulk mode the facts are migrated
+    in checkpointed chunks (one per stage and legacy period) that are
+    skipped when a previous run completed them and their legacy rows have
+    not changed since; restart clears the checkpoints.
+    """
     print("=" * 60)
     print("STAR SCHEMA MIGRATION")
     print("Surovi Agro Industries Dashboard")
     print("=" * 60)
     
+    bind = create_engine(database_url) if database_url else engine
+    
     # Create tables
-    create_star_schema_tables()
+    create_star_schema_tables(bind)
     
     # Get database session
-    db = SessionLocal()
+    db = sessionmaker(bind=bind, autocommit=False, autoflush=False)() if database_url else SessionLocal()
+    
+    started = time.perf_counter()
     
     try:
-        # Populate dimensions first
-        populate_dim_time(db)
-        populate_dim_region(db)
-        populate_dim_product(db)
+        if mode == 'bulk':
+            populate_dim_time_bulk(db)
+            populate_dim_region_bulk(db)
+            populate_dim_product_bulk(db)
+            
+            summary = run_chunks(pending_chunks(db, restart), write_mode, workers, database_url)
+            if summary['failed']:
+                raise RuntimeError(f"{len(summary['failed'])} chunks failed, re-run the migration to resume")
+        else:
+            # Populate dimensions first
+            populate_dim_time(db)
+            populate_dim_region(db)
+            populate_dim_product(db)
+            
+            # Then populate facts
+            populate_fact_sales(db)
+            populate_fact_product_performance(db)
+        
+        backfill_year_over_year(db)
         
-        # Then populate facts
-        populate_fact_sales(db)
-        populate_fact_product_performance(db)
+        # Readers cache by table version; everything may have changed
+        bump_versions(db, TRACKED_TABLES)
+        db.commit()
         
         print("\n" + "=" * 60)
-        print("✅ MIGRATION COMPLETE!")
+        print(f"✅ MIGRATION COMPLETE! ({mode} mode, {time.perf_counter() - started:.1f}s)")
         print("=" * 60)
         
         # Print summary
@@ -342,7 +826,7 @@ def run_migration():
         print(f"  dim_product: {db.query(DimProduct).count()} records")
         print(f"  fact_sales: {db.query(FactSales).count()} records")
         print(f"  fact_product_performance: {db.query(FactProductPerformance).count()} records")
-        
+    
     except Exception as e:
         print(f"\n❌ Error during migration: {e}")
         db.rollback()
@@ -351,5 +835,18 @@ def run_migration():
         db.close()
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Populate the star schema from the legacy tables")
+    parser.add_argument('--mode', choices=MIGRATION_MODES, default='bulk',
+                        help="bulk: set-based (default), row: original row-by-row migration")
+    parser.add_argument('--write-mode', choices=[mode for mode in WRITE_MODES if mode != 'upsert'],
+                        default=DEFAULT_WRITE_MODE, help="Fact write mode of the bulk migration")
+    parser.add_argument('--workers', type=int, default=1, help="Processes migrating fact chunks in parallel")
+    parser.add_argument('--restart', action='store_true', help="Ignore checkpoints of previous runs")
+    parser.add_argument('--database-url', default=None, help="Defaults to the configured database")
+    args = parser.parse_args()
+    run_migration(args.mode, args.write_mode, args.workers, args.restart, args.database_url)
+
+
 if __name__ == "__main__":
-    run_migration()
+    main()
@@ -4,10 +4,18 @@ Star Schema for Surovi Agro Industries Dashboard
 
 This implements a simple star schema with:
 - 3 Dimension Tables: dim_time, dim_region, dim_product
+- dim_date: optional daily calendar rolled up to dim_time
 - 2 Fact Tables: fact_sales, fact_product_performance
+- 3 Aggregate Tables: agg_sales_zone_month, agg_sales_division_month, agg_sales_month
+- upload_ledger: processed uploads (content hash, period, row counts)
+- data_version: per-table change counters (ETags)
+- migration_checkpoint: progress of the chunked star schema migration
+
+Fact and aggregate measures are Amount / Percent columns, stored as float,
+NUMERIC or integer minor units depending on MEASURE_STORAGE.
 
 Star Schema Diagram:
-                                    
+
                  +---------------+
                  |   dim_time    |
                  +---------------+
@@ -61,10 +69,97 @@ Star Schema Diagram:
 
 """
 
-from sqlalchemy import Column, Integer, String, Float, SmallInteger, Date, TIMESTAMP, ForeignKey, UniqueConstraint, Index
+import math
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Float, Numeric, SmallInteger, Date, Text, TIMESTAMP,
+    ForeignKey, UniqueConstraint, Index
+)
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from app.database import Base
+from app.config import settings
+
+
+# ==================== MEASURE TYPES ====================
+# Storage of the fact and aggregate measures, selected by MEASURE_STORAGE.
+# Existing databases are converted with app.migrate_measure_storage.
+
+MEASURE_STORAGES = ['float', 'numeric', 'minor_units']
+
+
+class Amount(TypeDecorator):
+    """
+    Amount measure (BDT values and volumes, two decimals). Stored as:
+    - float:       double precision, values pass through unchanged
+    - numeric:     NUMERIC(18, 2)
+    - minor_units: BIGINT count of hundredths (paisa for BDT)
+    Outside float storage None / NaN / infinity are written as 0, so read
+    paths never see them in a stored measure, and values (including SUMs)
+    are returned as float.
+    """
+    impl = Float
+    cache_ok = True
+    
+    scale = 100
+    numeric_precision = 18
+    integer_type = BigInteger
+    max_units = None
+    
+    def __init__(self, storage: str = None):
+        super().__init__()
+        self.storage = storage or settings.MEASURE_STORAGE
+        if self.storage not in MEASURE_STORAGES:
+            raise ValueError(f"Unknown measure storage: {self.storage}. Use one of {', '.join(MEASURE_STORAGES)}")
+    
+    def load_dialect_impl(self, dialect):
+        if self.storage == 'numeric':
+            return dialect.type_descriptor(Numeric(self.numeric_precision, 2, asdecimal=False))
+        if self.storage == 'minor_units':
+            return dialect.type_descriptor(self.integer_type())
+        return dialect.type_descriptor(Float())
+    
+    def to_units(self, value) -> int:
+        """value in 1/scale units, rounded half away from zero like NUMERIC"""
+        units = int((Decimal(str(value)) * self.scale).to_integral_value(ROUND_HALF_UP))
+        if self.max_units is not None:
+            units = max(-self.max_units, min(units, self.max_units))
+        return units
+    
+    def process_bind_param(self, value, dialect):
+        if self.storage == 'float':
+            return value
+        if value is None or not math.isfinite(value):
+            return 0
+        units = self.to_units(value)
+        return units if self.storage == 'minor_units' else Decimal(units) / self.scale
+    
+    def process_result_value(self, value, dialect):
+        if self.storage == 'minor_units' and value is not None:
+            return float(value) / self.scale
+        return value
+    
+    def stored_value(self, value):
+        """value as it reads back after being written"""
+        if self.storage == 'float':
+            return value
+        stored = self.process_bind_param(value, None)
+        return stored / self.scale if self.storage == 'minor_units' else float(stored)
+
+
+class Percent(Amount):
+    """
+    Percentage measure, two decimals. In minor_units storage an INTEGER
+    count of hundredths of a percent. Outside float storage values beyond
+    that range (over 21 million percent, growth from a near-zero base) are
+    clamped.
+    """
+    cache_ok = True
+    
+    numeric_precision = 12
+    integer_type = Integer
+    max_units = 2 ** 31 - 1
 
 
 # ==================== DIMENSION TABLES ====================
@@ -98,6 +193,28 @@ class DimTime(Base):
     )
 
 
+class DimDate(Base):
+    """
+    Date Dimension - Daily calendar attributes (generated by services/calendar_dimension.py)
+    Grain: Daily (one row per day, rolled up to its month in dim_time)
+    """
+    __tablename__ = "dim_date"
+    
+    date_id = Column(Integer, primary_key=True, autoincrement=True)
+    date = Column(Date, nullable=False, unique=True)
+    day = Column(SmallInteger, nullable=False)
+    day_of_week = Column(SmallInteger, nullable=False)  # ISO: 1 = Monday ... 7 = Sunday
+    day_name = Column(String(10), nullable=False)
+    is_weekend = Column(SmallInteger, default=0)  # Friday and Saturday
+    month = Column(SmallInteger, nullable=False)
+    year = Column(SmallInteger, nullable=False)
+    time_id = Column(Integer, ForeignKey("dim_time.time_id"), nullable=False)
+    
+    __table_args__ = (
+        Index('idx_dim_date_time', 'time_id'),
+    )
+
+
 class DimRegion(Base):
     """
     Region Dimension - Contains geographic/territorial attributes
@@ -120,6 +237,7 @@ class DimRegion(Base):
     fact_sales = relationship("FactSales", back_populates="region_dim")
     
     __table_args__ = (
+        Index('uq_dim_region_area_name', 'area_name', unique=True),
         Index('idx_dim_region_division', 'division'),
         Index('idx_dim_region_zone', 'zone'),
     )
@@ -148,6 +266,7 @@ class DimProduct(Base):
     fact_products = relationship("FactProductPerformance", back_populates="product_dim")
     
     __table_args__ = (
+        Index('uq_dim_product_product_name', 'product_name', unique=True),
         Index('idx_dim_product_category', 'product_category'),
         Index('idx_dim_product_group', 'product_group'),
     )
@@ -170,23 +289,23 @@ class FactSales(Base):
     time_id = Column(Integer, ForeignKey("dim_time.time_id"), nullable=False)
     
     # Sales Measures
-    sales_target = Column(Float, default=0)
-    gross_sales = Column(Float, default=0)
-    sales_return = Column(Float, default=0)
-    net_sales = Column(Float, default=0)
-    sales_achievement_pct = Column(Float, default=0)
+    sales_target = Column(Amount, default=0)
+    gross_sales = Column(Amount, default=0)
+    sales_return = Column(Amount, default=0)
+    net_sales = Column(Amount, default=0)
+    sales_achievement_pct = Column(Percent, default=0)
     
     # Collection Measures
-    coll_target = Column(Float, default=0)
-    total_collection = Column(Float, default=0)
-    cash_collection = Column(Float, default=0)
-    credit_collection = Column(Float, default=0)
-    seed_collection = Column(Float, default=0)
-    coll_achievement_pct = Column(Float, default=0)
+    coll_target = Column(Amount, default=0)
+    total_collection = Column(Amount, default=0)
+    cash_collection = Column(Amount, default=0)
+    credit_collection = Column(Amount, default=0)
+    seed_collection = Column(Amount, default=0)
+    coll_achievement_pct = Column(Percent, default=0)
     
     # Derived Measures
-    outstanding = Column(Float, default=0)  # net_sales - total_collection
-    return_rate_pct = Column(Float, default=0)  # sales_return / gross_sales * 100
+    outstanding = Column(Amount, default=0)  # net_sales - total_collection
+    return_rate_pct = Column(Percent, default=0)  # sales_return / gross_sales * 100
     
     # Audit
     created_at = Column(TIMESTAMP, server_default=func.now())
@@ -218,18 +337,18 @@ class FactProductPerformance(Base):
     time_id = Column(Integer, ForeignKey("dim_time.time_id"), nullable=False)
     
     # Current Period Measures
-    sales_value = Column(Float, default=0)  # In BDT
-    sales_volume = Column(Float, default=0)  # In units
+    sales_value = Column(Amount, default=0)  # In BDT
+    sales_volume = Column(Amount, default=0)  # In units
     
     # Previous Year Measures (for YoY comparison)
-    prev_year_value = Column(Float, default=0)
-    prev_year_volume = Column(Float, default=0)
+    prev_year_value = Column(Amount, default=0)
+    prev_year_volume = Column(Amount, default=0)
     
     # Growth Metrics
-    value_growth = Column(Float, default=0)  # Current - Previous
-    volume_growth = Column(Float, default=0)
-    value_growth_pct = Column(Float, default=0)  # Growth %
-    volume_growth_pct = Column(Float, default=0)
+    value_growth = Column(Amount, default=0)  # Current - Previous
+    volume_growth = Column(Amount, default=0)
+    value_growth_pct = Column(Percent, default=0)  # Growth %
+    volume_growth_pct = Column(Percent, default=0)
     
     # Audit
     created_at = Column(TIMESTAMP, server_default=func.now())
@@ -246,6 +365,168 @@ class FactProductPerformance(Base):
     )
 
 
+# ==================== AGGREGATE TABLES ====================
+# Rollups of fact_sales, refreshed per time_id whenever a period's sales
+# facts are written (see app.services.sales_aggregates)
+
+class AggSalesZoneMonth(Base):
+    """
+    Sales Aggregate by Zone
+    Grain: One row per Zone per Month
+    """
+    __tablename__ = "agg_sales_zone_month"
+    
+    agg_id = Column(Integer, primary_key=True, autoincrement=True)
+    zone = Column(String(50))
+    time_id = Column(Integer, ForeignKey("dim_time.time_id"), nullable=False)
+    
+    sales_target = Column(Amount, default=0)
+    gross_sales = Column(Amount, default=0)
+    sales_return = Column(Amount, default=0)
+    net_sales = Column(Amount, default=0)
+    coll_target = Column(Amount, default=0)
+    total_collection = Column(Amount, default=0)
+    cash_collection = Column(Amount, default=0)
+    credit_collection = Column(Amount, default=0)
+    seed_collection = Column(Amount, default=0)
+    outstanding = Column(Amount, default=0)
+    region_count = Column(Integer, default=0)
+    
+    __table_args__ = (
+        Index('idx_agg_sales_zone_time', 'time_id', 'zone'),
+    )
+
+
+class AggSalesDivisionMonth(Base):
+    """
+    Sales Aggregate by Division
+    Grain: One row per Division per Month
+    """
+    __tablename__ = "agg_sales_division_month"
+    
+    agg_id = Column(Integer, primary_key=True, autoincrement=True)
+    division = Column(String(100))
+    zone = Column(String(50))
+    time_id = Column(Integer, ForeignKey("dim_time.time_id"), nullable=False)
+    
+    sales_target = Column(Amount, default=0)
+    gross_sales = Column(Amount, default=0)
+    sales_return = Column(Amount, default=0)
+    net_sales = Column(Amount, default=0)
+    coll_target = Column(Amount, default=0)
+    total_collection = Column(Amount, default=0)
+    cash_collection = Column(Amount, default=0)
+    credit_collection = Column(Amount, default=0)
+    seed_collection = Column(Amount, default=0)
+    outstanding = Column(Amount, default=0)
+    region_count = Column(Integer, default=0)
+    
+    __table_args__ = (
+        Index('idx_agg_sales_division_time', 'time_id', 'division'),
+    )
+
+
+class AggSalesMonth(Base):
+    """
+    Sales Aggregate by Month
+    Grain: One row per Month (company total)
+    """
+    __tablename__ = "agg_sales_month"
+    
+    time_id = Column(Integer, ForeignKey("dim_time.time_id"), primary_key=True)
+    
+    sales_target = Column(Amount, default=0)
+    gross_sales = Column(Amount, default=0)
+    sales_return = Column(Amount, default=0)
+    net_sales = Column(Amount, default=0)
+    coll_target = Column(Amount, default=0)
+    total_collection = Column(Amount, default=0)
+    cash_collection = Column(Amount, default=0)
+    credit_collection = Column(Amount, default=0)
+    seed_collection = Column(Amount, default=0)
+    outstanding = Column(Amount, default=0)
+    region_count = Column(Integer, default=0)
+
+
+# ==================== UPLOAD LEDGER ====================
+
+class UploadLedger(Base):
+    """
+    Upload Ledger
+    One row per processed upload: content hash, file type, resolved period
+    and resulting row counts. Used to skip re-uploads of identical files.
+    """
+    __tablename__ = "upload_ledger"
+    
+    upload_id = Column(Integer, primary_key=True, autoincrement=True)
+    content_hash = Column(String(64), nullable=False)  # SHA-256 hex digest
+    file_type = Column(String(30), nullable=False)  # sales_collection, product_comparison
+    filename = Column(String(255))
+    
+    # Resolved period
+    month = Column(SmallInteger, nullable=False)
+    year = Column(SmallInteger, nullable=False)
+    
+    # Result
+    records_processed = Column(Integer, default=0)  # Regions or products
+    rows_deleted = Column(Integer, default=0)
+    rows_inserted = Column(Integer, default=0)
+    
+    # Audit
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    
+    __table_args__ = (
+        Index('idx_upload_ledger_period', 'file_type', 'month', 'year'),
+        Index('idx_upload_ledger_hash', 'content_hash'),
+    )
+
+
+# ==================== DATA VERSIONS ====================
+
+class DataVersion(Base):
+    """
+    Data Version
+    One row per star schema table, incremented in the same transaction as
+    every upload that changes it. Used to build ETags for read endpoints.
+    """
+    __tablename__ = "data_version"
+    
+    table_name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+# ==================== MIGRATION ====================
+
+class MigrationCheckpoint(Base):
+    """
+    Migration Checkpoint
+    One row per migration stage and legacy period. A chunk is marked done in
+    the same transaction that writes its facts, so an interrupted migration
+    resumes with the chunks that are not done. legacy_rows is the number of
+    legacy rows of the period when the chunk ran; a done chunk whose period
+    has changed since is migrated again.
+    """
+    __tablename__ = "migration_checkpoint"
+    
+    checkpoint_id = Column(Integer, primary_key=True, autoincrement=True)
+    stage = Column(String(50), nullable=False)  # fact_sales, fact_product_performance
+    month = Column(SmallInteger, nullable=False)
+    year = Column(SmallInteger, nullable=False)
+    
+    status = Column(String(20), nullable=False, default='pending')  # done, failed
+    rows_written = Column(Integer, default=0)
+    legacy_rows = Column(Integer)
+    seconds = Column(Float)
+    error = Column(Text)
+    
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint('stage', 'month', 'year', name='uq_migration_checkpoint'),
+    )
+
+
 # ==================== HELPER FUNCTIONS ====================
 
 def get_month_name(month: int) -> str:
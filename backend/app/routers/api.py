@@ -1,32 +1,132 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, case, true, or_
 from typing import List, Optional
 from io import BytesIO
+from datetime import date
 import math
 import os
-
-from app.database import get_db
-from app.models_star_schema import DimTime, DimRegion, DimProduct, FactSales, FactProductPerformance
-from app.schemas import FileUploadResponse
+import shutil
+import tempfile
+
+from app.database import get_db, get_async_db, SessionLocal
+from app.config import settings
+from app.models_star_schema import (
+    DimTime, DimRegion, DimProduct, FactSales, FactProductPerformance,
+    AggSalesZoneMonth, AggSalesDivisionMonth, AggSalesMonth
+)
+from app.schemas import FileUploadResponse, BatchUploadResponse
 from app.services.file_processor import (
-    process_sales_collection_file, process_product_comparison_file, 
-    detect_file_type, get_sample_format_info, generate_sample_template
+    process_upload, detect_file_type, get_sample_format_info, generate_sample_template
 )
+from app.services.fact_writer import WRITE_MODES, DEFAULT_WRITE_MODE
+from app.services.upload_jobs import upload_jobs, make_upload_response
+from app.services.batch_upload import process_batch
+from app.services.result_cache import result_cache
+from app.services.data_versions import get_versions, etag_for
+from app.services.fact_queries import (
+    FactListing, FACT_LISTINGS, SALES_LISTING, COLLECTION_LISTING, PRODUCT_SALES_LISTING
+)
+from app.services.fact_export import EXPORT_FORMATS, encode_records
+from app.services.report_exporter import REPORTS, write_report, period_label
 
 router = APIRouter()
 
+# Largest page the fact listings return per request
+MAX_PAGE_SIZE = 10000
+
+
+# Measures stored as NUMERIC or minor units are written as 0 instead of
+# None / NaN / infinity, so only float storage needs per-value scrubbing
+MEASURES_NEED_CLEANING = settings.MEASURE_STORAGE == 'float'
+
 
 def clean_value(val):
     """Convert NaN/None to 0 for JSON serialization"""
     if val is None:
         return 0
-    if isinstance(val, float) and (math.isnan(val) or math.isinf(val)):
+    if MEASURES_NEED_CLEANING and isinstance(val, float) and (math.isnan(val) or math.isinf(val)):
         return 0
     return val
 
 
+def measures_to_clean(listing: FactListing, field_names: List[str]) -> List[str]:
+    """Requested measures of a listing that may hold None / NaN"""
+    if not MEASURES_NEED_CLEANING:
+        return []
+    return [name for name in field_names if name in listing.measures]
+
+
+def filter_period(query, month: Optional[int], year: Optional[int]):
+    """Apply optional DimTime month/year filters to a query joined to dim_time"""
+    if month:
+        query = query.filter(DimTime.month == month)
+    if year:
+        query = query.filter(DimTime.year == year)
+    return query
+
+
+def etag_guard(*tables: str):
+    """
+    Dependency adding an ETag derived from the versions of the given tables
+    (plus Cache-Control: no-cache so clients revalidate). A request whose
+    If-None-Match matches is answered with 304 before the endpoint runs.
+    """
+    async def dependency(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+        versions = await db.run_sync(get_versions, tables)
+        etag = etag_for(request.url.path, request.query_params.multi_items(), versions)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        
+        if_none_match = request.headers.get('if-none-match', '')
+        client_etags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        if etag in client_etags or '*' in client_etags:
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return dependency
+
+
+async def list_facts(listing: FactListing, response: Response, db: AsyncSession, month: Optional[int], year: Optional[int],
+               fields: Optional[str], cursor: Optional[int], limit: Optional[int]) -> List[dict]:
+    """
+    One page of a fact listing with only the requested fields. Sets
+    X-Total-Count (rows matching month/year) and, when more rows follow,
+    X-Next-Cursor to pass as cursor for the next page.
+    """
+    try:
+        field_names = listing.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    rows, next_cursor = await listing.page(db, field_names, month, year, cursor, limit)
+    if cursor is None and next_cursor is None:
+        total = len(rows)
+    else:
+        total = await listing.count(db, month, year)
+    
+    response.headers['X-Total-Count'] = str(total)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    
+    # An unpaged listing can hold every fact row, keep the loop off the event loop
+    return await run_in_threadpool(fact_records, rows, measures_to_clean(listing, field_names))
+
+
+def fact_records(rows, measures: List[str]) -> List[dict]:
+    """Listing rows as dicts without the cursor column, with the measures cleaned"""
+    records = []
+    for row in rows:
+        record = row._asdict()
+        del record['_cursor']
+        for name in measures:
+            record[name] = clean_value(record[name])
+        records.append(record)
+    return records
+
+
 # ============================================================================
 # FILE UPLOAD ENDPOINTS
 # ============================================================================
@@ -59,11 +159,37 @@ def download_template(template_type: str):
         raise HTTPException(status_code=500, detail=f"Error generating template: {str(e)}")
 
 
+def validate_upload(filename: str, month: Optional[int], year: Optional[int], write_mode: str) -> str:
+    """Validate upload parameters and return the detected file type"""
+    if not filename.endswith(('.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="Only Excel files (.xlsx, .xls) are supported")
+    
+    # Validate month/year if provided
+    if month is not None and (month < 1 or month > 12):
+        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
+    if year is not None and (year < 2020 or year > 2030):
+        raise HTTPException(status_code=400, detail="Year must be between 2020 and 2030")
+    if write_mode not in WRITE_MODES:
+        raise HTTPException(status_code=400, detail=f"write_mode must be one of: {', '.join(WRITE_MODES)}")
+    
+    file_type = detect_file_type(filename)
+    if file_type == 'unknown':
+        raise HTTPException(
+            status_code=400, 
+            detail="Unknown file type. Filename should contain 'Sales_Collection' or 'Product_Comparison'. "
+                   "Use GET /api/upload/sample-format to see expected formats."
+        )
+    return file_type
+
+
 @router.post("/upload", response_model=FileUploadResponse)
 async def upload_file(
     file: UploadFile = File(...), 
     month: Optional[int] = Form(None, description="Override month (1-12)"),
     year: Optional[int] = Form(None, description="Override year (e.g., 2025)"),
+    write_mode: str = Form(DEFAULT_WRITE_MODE, description="Fact write mode: auto, orm, executemany, copy or upsert"),
+    streaming: bool = Form(False, description="Read the workbook in bounded chunks (large .xlsx files)"),
+    force: bool = Form(False, description="Reprocess even if an identical file was already loaded"),
     db: Session = Depends(get_db)
 ):
     """
@@ -72,66 +198,121 @@ async def upload_file(
     - Automatically detects month/year from filename or Excel content
     - You can override month/year using form parameters
     - Existing data for the same month/year will be REPLACED
+    - write_mode selects the bulk insert strategy ('auto' uses COPY on PostgreSQL);
+      'upsert' keeps unchanged rows and only writes the difference
+    - streaming=true keeps memory bounded for very large workbooks
+    - Re-uploading the file last loaded for a period is a no-op unless force=true
+    
+    Processing runs in the threadpool so other requests are not blocked;
+    use POST /api/upload/jobs to get a job id back immediately instead.
     
     Supported file types:
     - Sales & Collection: filename should contain 'sales' and 'collection'
     - Product Comparison: filename should contain 'product' or 'comparison'
     """
+    file_type = validate_upload(file.filename, month, year, write_mode)
     
-    if not file.filename.endswith(('.xlsx', '.xls')):
-        raise HTTPException(status_code=400, detail="Only Excel files (.xlsx, .xls) are supported")
-    
-    # Validate month/year if provided
-    if month is not None and (month < 1 or month > 12):
-        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
-    if year is not None and (year < 2020 or year > 2030):
-        raise HTTPException(status_code=400, detail="Year must be between 2020 and 2030")
-    
-    content = await file.read()
-    file_content = BytesIO(content)
-    
-    file_type = detect_file_type(file.filename)
-    
-    if file_type == 'sales_collection':
-        success, message, details = process_sales_collection_file(
-            file_content, file.filename, db, 
-            override_month=month, override_year=year
-        )
-    elif file_type == 'product_comparison':
-        success, message, details = process_product_comparison_file(
-            file_content, file.filename, db,
-            override_month=month, override_year=year
-        )
+    if streaming:
+        # Read straight from the spooled upload instead of copying it into memory
+        file_content = file.file
     else:
-        raise HTTPException(
-            status_code=400, 
-            detail="Unknown file type. Filename should contain 'Sales_Collection' or 'Product_Comparison'. "
-                   "Use GET /api/upload/sample-format to see expected formats."
-        )
+        content = await file.read()
+        file_content = BytesIO(content)
+    
+    success, message, details = await run_in_threadpool(
+        process_upload, file_content, file.filename, file_type, db,
+        override_month=month, override_year=year, write_mode=write_mode, streaming=streaming, force=force
+    )
     
     if not success:
         raise HTTPException(status_code=500, detail=message)
     
-    # Calculate meaningful total
-    total_records = details.get('fact_sales_inserted', 0) + details.get('fact_records_inserted', 0)
+    return make_upload_response(success, message, file_type, details)
+
+
+def spool_upload(file: UploadFile) -> str:
+    """Copy an upload to a temporary file for a background job and return its path"""
+    suffix = os.path.splitext(file.filename)[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        shutil.copyfileobj(file.file, tmp)
+        return tmp.name
+
+
+@router.post("/upload/jobs", status_code=202)
+async def create_upload_job(
+    file: UploadFile = File(...), 
+    month: Optional[int] = Form(None, description="Override month (1-12)"),
+    year: Optional[int] = Form(None, description="Override year (e.g., 2025)"),
+    write_mode: str = Form(DEFAULT_WRITE_MODE, description="Fact write mode: auto, orm, executemany, copy or upsert"),
+    streaming: bool = Form(False, description="Read the workbook in bounded chunks (large .xlsx files)"),
+    force: bool = Form(False, description="Reprocess even if an identical file was already loaded")
+):
+    """
+    Queue an Excel upload for background processing.
+    
+    Takes the same parameters as POST /api/upload but returns a job id
+    immediately. Poll GET /api/upload/jobs/{job_id} for status, progress
+    and the final upload response.
+    """
+    file_type = validate_upload(file.filename, month, year, write_mode)
+    file_path = await run_in_threadpool(spool_upload, file)
     
-    return FileUploadResponse(
-        success=success,
-        message=message,
-        file_type=file_type,
-        records_processed=total_records,
-        details=details
+    job = upload_jobs.submit(
+        file_path, file.filename, file_type,
+        override_month=month, override_year=year, write_mode=write_mode, streaming=streaming, force=force
     )
+    return job.to_dict()
+
+
+@router.get("/upload/jobs")
+def list_upload_jobs():
+    """List recent upload jobs, newest first"""
+    return [job.to_dict() for job in upload_jobs.list()]
+
+
+@router.get("/upload/jobs/{job_id}")
+def get_upload_job(job_id: str):
+    """Get status, progress and result of an upload job"""
+    job = upload_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job.to_dict()
+
+
+@router.post("/upload/batch", response_model=BatchUploadResponse)
+async def upload_batch(
+    files: List[UploadFile] = File(..., description="Excel workbooks and/or ZIP archives of workbooks"),
+    write_mode: str = Form(DEFAULT_WRITE_MODE, description="Fact write mode: auto, orm, executemany, copy or upsert"),
+    force: bool = Form(False, description="Reprocess even if an identical file was already loaded"),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload several Excel files (or ZIP archives of them) in one request.
+    
+    - Each workbook is classified by filename like POST /api/upload
+    - Workbooks are parsed in parallel worker processes
+    - All facts are written in one transaction; existing data for each
+      month/year is REPLACED, and if two files cover the same period the
+      later one wins
+    - Files identical to the last upload for their period are skipped
+      unless force=true
+    - Returns a result per file; nothing is written if the load fails
+    """
+    if write_mode not in WRITE_MODES:
+        raise HTTPException(status_code=400, detail=f"write_mode must be one of: {', '.join(WRITE_MODES)}")
+    
+    contents = [(file.filename, await file.read()) for file in files]
+    return await run_in_threadpool(process_batch, contents, db, write_mode, force=force)
 
 
 # ============================================================================
 # REGION ENDPOINTS (Using dim_region)
 # ============================================================================
 
-@router.get("/regions")
-def get_regions(db: Session = Depends(get_db)):
+@router.get("/regions", dependencies=[Depends(etag_guard('dim_region'))])
+async def get_regions(db: AsyncSession = Depends(get_async_db)):
     """Get all regions from dimension table"""
-    regions = db.query(DimRegion).filter(DimRegion.is_active == 1).all()
+    regions = (await db.execute(select(DimRegion).where(DimRegion.is_active == 1))).scalars().all()
     return [{
         'region_id': r.region_id,
         'area_code': r.area_code,
@@ -143,9 +324,9 @@ def get_regions(db: Session = Depends(get_db)):
 
 
 @router.get("/regions/{region_id}")
-def get_region(region_id: int, db: Session = Depends(get_db)):
+async def get_region(region_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get region by ID"""
-    region = db.query(DimRegion).filter(DimRegion.region_id == region_id).first()
+    region = await db.get(DimRegion, region_id)
     if not region:
         raise HTTPException(status_code=404, detail="Region not found")
     return {
@@ -162,10 +343,10 @@ def get_region(region_id: int, db: Session = Depends(get_db)):
 # PRODUCT ENDPOINTS (Using dim_product)
 # ============================================================================
 
-@router.get("/products")
-def get_products(db: Session = Depends(get_db)):
+@router.get("/products", dependencies=[Depends(etag_guard('dim_product'))])
+async def get_products(db: AsyncSession = Depends(get_async_db)):
     """Get all products from dimension table"""
-    products = db.query(DimProduct).filter(DimProduct.is_active == 1).all()
+    products = (await db.execute(select(DimProduct).where(DimProduct.is_active == 1))).scalars().all()
     return [{
         'product_id': p.product_id,
         'product_code': p.product_code,
@@ -181,10 +362,20 @@ def get_products(db: Session = Depends(get_db)):
 # TIME DIMENSION ENDPOINTS
 # ============================================================================
 
-@router.get("/time-periods")
-def get_time_periods(db: Session = Depends(get_db)):
+@router.get("/time-periods", dependencies=[Depends(etag_guard('dim_time', 'fact_sales', 'fact_product_performance'))])
+async def get_time_periods(
+    with_data: bool = Query(True, description="Only periods with sales or product facts (false: the whole calendar)"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get available time periods"""
-    times = db.query(DimTime).order_by(DimTime.year.desc(), DimTime.month.desc()).all()
+    query = select(DimTime).order_by(DimTime.year.desc(), DimTime.month.desc())
+    if with_data:
+        # The calendar is pre-generated, so most months have no facts
+        query = query.where(or_(
+            select(FactSales.time_id).where(FactSales.time_id == DimTime.time_id).exists(),
+            select(FactProductPerformance.time_id).where(FactProductPerformance.time_id == DimTime.time_id).exists()
+        ))
+    times = (await db.execute(query)).scalars().all()
     return [{
         'time_id': t.time_id,
         'month': t.month,
@@ -201,179 +392,221 @@ def get_time_periods(db: Session = Depends(get_db)):
 # SALES ENDPOINTS (Using fact_sales)
 # ============================================================================
 
-@router.get("/sales")
-def get_sales(month: int = None, year: int = None, db: Session = Depends(get_db)):
+@router.get("/sales", dependencies=[Depends(etag_guard('fact_sales', 'dim_region', 'dim_time'))])
+async def get_sales(
+    response: Response,
+    month: int = None,
+    year: int = None,
+    fields: Optional[str] = Query(None, description="Comma separated fields to return (default: all)"),
+    cursor: Optional[int] = Query(None, ge=0, description="Return rows after this fact_id (X-Next-Cursor of the previous page)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size (default: all rows)"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get sales data from fact table with optional month/year filter"""
-    
-    query = db.query(
-        FactSales,
-        DimRegion.area_name,
-        DimRegion.division,
-        DimRegion.zone,
-        DimTime.month,
-        DimTime.year,
-        DimTime.month_name
-    ).join(
-        DimRegion, FactSales.region_id == DimRegion.region_id
-    ).join(
-        DimTime, FactSales.time_id == DimTime.time_id
-    )
-    
-    if month:
-        query = query.filter(DimTime.month == month)
-    if year:
-        query = query.filter(DimTime.year == year)
-    
-    results = query.all()
-    
-    return [{
-        'fact_id': r[0].fact_id,
-        'region_id': r[0].region_id,
-        'area_name': r[1],
-        'division': r[2],
-        'zone': r[3],
-        'month': r[4],
-        'year': r[5],
-        'month_name': r[6],
-        'sales_target': clean_value(r[0].sales_target),
-        'gross_sales': clean_value(r[0].gross_sales),
-        'sales_return': clean_value(r[0].sales_return),
-        'net_sales': clean_value(r[0].net_sales),
-        'sales_ach_pct': clean_value(r[0].sales_achievement_pct),
-        'return_rate_pct': clean_value(r[0].return_rate_pct)
-    } for r in results]
+    return await list_facts(SALES_LISTING, response, db, month, year, fields, cursor, limit)
 
 
 # ============================================================================
 # COLLECTION ENDPOINTS (Using fact_sales)
 # ============================================================================
 
-@router.get("/collections")
-def get_collections(month: int = None, year: int = None, db: Session = Depends(get_db)):
+@router.get("/collections", dependencies=[Depends(etag_guard('fact_sales', 'dim_region', 'dim_time'))])
+async def get_collections(
+    response: Response,
+    month: int = None,
+    year: int = None,
+    fields: Optional[str] = Query(None, description="Comma separated fields to return (default: all)"),
+    cursor: Optional[int] = Query(None, ge=0, description="Return rows after this fact_id (X-Next-Cursor of the previous page)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size (default: all rows)"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get collection data from fact table with optional month/year filter"""
-    
-    query = db.query(
-        FactSales,
-        DimRegion.area_name,
-        DimRegion.division,
-        DimRegion.zone,
-        DimTime.month,
-        DimTime.year,
-        DimTime.month_name
-    ).join(
-        DimRegion, FactSales.region_id == DimRegion.region_id
-    ).join(
-        DimTime, FactSales.time_id == DimTime.time_id
-    )
-    
-    if month:
-        query = query.filter(DimTime.month == month)
-    if year:
-        query = query.filter(DimTime.year == year)
-    
-    results = query.all()
-    
-    return [{
-        'fact_id': r[0].fact_id,
-        'region_id': r[0].region_id,
-        'area_name': r[1],
-        'division': r[2],
-        'zone': r[3],
-        'month': r[4],
-        'year': r[5],
-        'month_name': r[6],
-        'coll_target': clean_value(r[0].coll_target),
-        'total_coll': clean_value(r[0].total_collection),
-        'coll_ach_pct': clean_value(r[0].coll_achievement_pct),
-        'cash_coll': clean_value(r[0].cash_collection),
-        'credit_coll': clean_value(r[0].credit_collection),
-        'seed_coll': clean_value(r[0].seed_collection),
-        'outstanding': clean_value(r[0].outstanding)
-    } for r in results]
+    return await list_facts(COLLECTION_LISTING, response, db, month, year, fields, cursor, limit)
 
 
 # ============================================================================
 # PRODUCT PERFORMANCE ENDPOINTS (Using fact_product_performance)
 # ============================================================================
 
-@router.get("/product-sales")
-def get_product_sales(month: int = None, year: int = None, db: Session = Depends(get_db)):
+@router.get("/product-sales", dependencies=[Depends(etag_guard('fact_product_performance', 'dim_product', 'dim_time'))])
+async def get_product_sales(
+    response: Response,
+    month: int = None,
+    year: int = None,
+    fields: Optional[str] = Query(None, description="Comma separated fields to return (default: all)"),
+    cursor: Optional[int] = Query(None, ge=0, description="Return rows after this fact_id (X-Next-Cursor of the previous page)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size (default: all rows)"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get product sales with value and volume from fact table"""
-    
-    query = db.query(
-        FactProductPerformance,
-        DimProduct.product_name,
-        DimProduct.product_category,
-        DimTime.month,
-        DimTime.year,
-        DimTime.month_name
-    ).join(
-        DimProduct, FactProductPerformance.product_id == DimProduct.product_id
-    ).join(
-        DimTime, FactProductPerformance.time_id == DimTime.time_id
+    return await list_facts(PRODUCT_SALES_LISTING, response, db, month, year, fields, cursor, limit)
+
+
+# ============================================================================
+# EXPORT ENDPOINTS (Streaming fact rows)
+# ============================================================================
+
+def export_records(listing: FactListing, field_names: List[str], month: Optional[int] = None,
+                   year: Optional[int] = None, **stream_options):
+    """
+    Cleaned fact records streamed from their own session: the response body
+    is produced after the request's get_db session has been closed.
+    """
+    measures = measures_to_clean(listing, field_names)
+    db = SessionLocal()
+    try:
+        for row in listing.stream(db, field_names, month, year, settings.EXPORT_BATCH_SIZE, **stream_options):
+            record = row._asdict()
+            for name in measures:
+                record[name] = clean_value(record[name])
+            yield record
+    finally:
+        db.close()
+
+
+@router.get("/export/{dataset}")
+def export_facts(
+    dataset: str,
+    format: str = Query('ndjson', description="ndjson or csv"),
+    month: int = None,
+    year: int = None,
+    fields: Optional[str] = Query(None, description="Comma separated fields to export (default: all)")
+):
+    """
+    Stream every fact row of a dataset (sales, collections or product-sales)
+    with its dimension attributes as NDJSON or CSV.
+    """
+    listing = FACT_LISTINGS.get(dataset)
+    if listing is None:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset. Use one of: {', '.join(FACT_LISTINGS)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}")
+    try:
+        field_names = listing.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    period = '_'.join(str(part) for part in (year, month) if part)
+    filename = f"{dataset}{'_' + period if period else ''}.{extension}"
+    
+    return StreamingResponse(
+        encode_records(export_records(listing, field_names, month, year), field_names, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@router.get("/reports/{report}")
+def export_report(
+    report: str,
+    start_month: int = Query(None, ge=1, le=12),
+    start_year: int = None,
+    end_month: int = Query(None, ge=1, le=12),
+    end_year: int = None
+):
+    """
+    Download an Excel report (sales, collections or product-comparison) of
+    the months from start_month/start_year to end_month/end_year. A missing
+    start_month / end_month means January / December of the year; a bound
+    without its year is open, and a month without its year is rejected.
+    """
+    definition = REPORTS.get(report)
+    if definition is None:
+        raise HTTPException(status_code=404, detail=f"Unknown report. Use one of: {', '.join(REPORTS)}")
+    
+    if start_month and not start_year:
+        raise HTTPException(status_code=400, detail="start_month requires start_year")
+    if end_month and not end_year:
+        raise HTTPException(status_code=400, detail="end_month requires end_year")
+    
+    start = (start_month or 1, start_year) if start_year else None
+    end = (end_month or 12, end_year) if end_year else None
+    if start and end and (start[1], start[0]) > (end[1], end[0]):
+        raise HTTPException(status_code=400, detail="Report start is after its end")
+    
+    records = export_records(
+        definition.listing, definition.field_names,
+        start=date(start[1], start[0], 1) if start else None,
+        end=date(end[1], end[0], 1) if end else None,
+        chronological=True
+    )
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        write_report(definition, records, path, start, end)
+    except Exception as e:
+        os.remove(path)
+        raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
+    
+    period = '_'.join(period_label(bound).replace(' ', '') for bound in (start, end) if bound) or 'All'
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=f"{definition.sheet.replace(' ', '_')}_Report_{period}.xlsx",
+        background=BackgroundTask(os.remove, path)
     )
-    
-    if month:
-        query = query.filter(DimTime.month == month)
-    if year:
-        query = query.filter(DimTime.year == year)
-    
-    results = query.all()
-    
-    return [{
-        'fact_id': r[0].fact_id,
-        'product_id': r[0].product_id,
-        'product_name': r[1],
-        'product_category': r[2],
-        'month': r[3],
-        'year': r[4],
-        'month_name': r[5],
-        'sales_value': clean_value(r[0].sales_value),
-        'sales_volume': clean_value(r[0].sales_volume),
-        'prev_year_value': clean_value(r[0].prev_year_value),
-        'prev_year_volume': clean_value(r[0].prev_year_volume),
-        'value_growth_pct': clean_value(r[0].value_growth_pct),
-        'volume_growth_pct': clean_value(r[0].volume_growth_pct)
-    } for r in results]
 
 
 @router.get("/product-comparison")
-def get_product_comparison(db: Session = Depends(get_db)):
-    """Get product YoY comparison from fact table"""
+async def get_product_comparison(base_year: int = 2024, compare_year: int = 2025, month: int = None,
+                                 db: AsyncSession = Depends(get_async_db)):
+    """
+    Get product YoY comparison from fact table.
+    
+    Value and volume of base_year and compare_year are pivoted per product in
+    a single grouped query (summed over the year, or for one month if given).
+    Keys follow the years, e.g. value_2024 / value_2025.
+    """
+    if base_year == compare_year:
+        raise HTTPException(status_code=400, detail="base_year and compare_year must differ")
+
+    def year_sum(column, year):
+        return func.coalesce(func.sum(case((DimTime.year == year, column), else_=0)), 0)
+    
+    totals = select(
+        FactProductPerformance.product_id,
+        year_sum(FactProductPerformance.sales_value, base_year).label('value_base'),
+        year_sum(FactProductPerformance.sales_value, compare_year).label('value_compare'),
+        year_sum(FactProductPerformance.sales_volume, base_year).label('volume_base'),
+        year_sum(FactProductPerformance.sales_volume, compare_year).label('volume_compare')
+    ).join(DimTime).where(DimTime.year.in_([base_year, compare_year]))
+    
+    if month:
+        totals = totals.where(DimTime.month == month)
+    totals = totals.group_by(FactProductPerformance.product_id).subquery()
     
-    products = db.query(DimProduct).filter(DimProduct.is_active == 1).all()
+    rows = (await db.execute(select(
+        DimProduct.product_id,
+        DimProduct.product_name,
+        DimProduct.product_category,
+        totals.c.value_base,
+        totals.c.value_compare,
+        totals.c.volume_base,
+        totals.c.volume_compare
+    ).outerjoin(totals, totals.c.product_id == DimProduct.product_id).where(
+        DimProduct.is_active == 1
+    ).order_by(DimProduct.product_id))).all()
     
     result = []
-    for product in products:
-        # Get 2024 data
-        data_2024 = db.query(FactProductPerformance).join(DimTime).filter(
-            FactProductPerformance.product_id == product.product_id,
-            DimTime.year == 2024
-        ).first()
+    for row in rows:
+        value_base = clean_value(row.value_base)
+        value_compare = clean_value(row.value_compare)
+        volume_base = clean_value(row.volume_base)
+        volume_compare = clean_value(row.volume_compare)
         
-        # Get 2025 data
-        data_2025 = db.query(FactProductPerformance).join(DimTime).filter(
-            FactProductPerformance.product_id == product.product_id,
-            DimTime.year == 2025
-        ).first()
-        
-        value_2024 = clean_value(data_2024.sales_value) if data_2024 else 0
-        value_2025 = clean_value(data_2025.sales_value) if data_2025 else 0
-        volume_2024 = clean_value(data_2024.sales_volume) if data_2024 else 0
-        volume_2025 = clean_value(data_2025.sales_volume) if data_2025 else 0
-        
-        value_growth = ((value_2025 - value_2024) / value_2024 * 100) if value_2024 > 0 else 0
-        volume_growth = ((volume_2025 - volume_2024) / volume_2024 * 100) if volume_2024 > 0 else 0
+        value_growth = ((value_compare - value_base) / value_base * 100) if value_base > 0 else 0
+        volume_growth = ((volume_compare - volume_base) / volume_base * 100) if volume_base > 0 else 0
         
         result.append({
-            'product_id': product.product_id,
-            'product_name': product.product_name,
-            'product_category': product.product_category,
-            'value_2024': value_2024,
-            'value_2025': value_2025,
+            'product_id': row.product_id,
+            'product_name': row.product_name,
+            'product_category': row.product_category,
+            f'value_{base_year}': value_base,
+            f'value_{compare_year}': value_compare,
             'value_growth_pct': round(clean_value(value_growth), 2),
-            'volume_2024': volume_2024,
-            'volume_2025': volume_2025,
+            f'volume_{base_year}': volume_base,
+            f'volume_{compare_year}': volume_compare,
             'volume_growth_pct': round(clean_value(volume_growth), 2)
         })
     
@@ -384,26 +617,21 @@ def get_product_comparison(db: Session = Depends(get_db)):
 # DASHBOARD SUMMARY ENDPOINT (Using fact tables)
 # ============================================================================
 
-@router.get("/dashboard-summary")
-def get_dashboard_summary(month: int = 11, year: int = 2025, db: Session = Depends(get_db)):
-    """Get dashboard summary with calculated metrics from fact tables"""
-    
-    # Get time_id for the specified month/year
-    time_dim = db.query(DimTime).filter(
-        DimTime.month == month,
-        DimTime.year == year
-    ).first()
-    
-    if not time_dim:
-        return {
-            'sales': {'total_regions': 0, 'total_sales_target': 0, 'total_gross_sales': 0, 'total_net_sales': 0, 'overall_achievement_pct': 0},
-            'collection': {'total_coll_target': 0, 'total_collection': 0, 'overall_coll_ach_pct': 0, 'cash_collection': 0, 'credit_collection': 0, 'seed_collection': 0},
-            'products': {'total_products': 0, 'total_value_current': 0, 'total_value_previous': 0, 'overall_growth_pct': 0},
-            'month': month, 'year': year
-        }
+def dashboard_summary_query(month: int, year: int):
+    """
+    Single SELECT returning every figure of the dashboard summary:
+    period (dim_time row), sales (fact_sales totals of the period), the
+    active product count and products (value of year and year - 1,
+    filtered on dim_time.year directly). The aggregate CTEs always return
+    one row, so the statement does too even if the period does not exist.
+    """
+    period = select(
+        DimTime.time_id, DimTime.month_name, DimTime.fiscal_year
+    ).where(
+        DimTime.month == month, DimTime.year == year
+    ).order_by(DimTime.time_id).limit(1).cte('period')
     
-    # Sales & Collection Summary from fact_sales
-    sales_data = db.query(
+    sales = select(
         func.count(FactSales.fact_id).label('count'),
         func.sum(FactSales.sales_target).label('total_target'),
         func.sum(FactSales.gross_sales).label('total_gross'),
@@ -413,43 +641,53 @@ def get_dashboard_summary(month: int = 11, year: int = 2025, db: Session = Depen
         func.sum(FactSales.cash_collection).label('cash_coll'),
         func.sum(FactSales.credit_collection).label('credit_coll'),
         func.sum(FactSales.seed_collection).label('seed_coll')
-    ).filter(
-        FactSales.time_id == time_dim.time_id
-    ).first()
-    
-    total_target = clean_value(sales_data.total_target)
-    total_net = clean_value(sales_data.total_net)
-    total_gross = clean_value(sales_data.total_gross)
-    coll_target = clean_value(sales_data.coll_target)
-    total_coll = clean_value(sales_data.total_coll)
-    cash_coll = clean_value(sales_data.cash_coll)
-    credit_coll = clean_value(sales_data.credit_coll)
-    seed_coll = clean_value(sales_data.seed_coll)
-    
-    # Product Summary from fact_product_performance
-    product_count = db.query(func.count(DimProduct.product_id)).filter(DimProduct.is_active == 1).scalar() or 0
-    
-    # Current year value
-    time_current = db.query(DimTime).filter(DimTime.year == year).all()
-    time_ids_current = [t.time_id for t in time_current]
-    
-    value_current = clean_value(db.query(func.sum(FactProductPerformance.sales_value)).filter(
-        FactProductPerformance.time_id.in_(time_ids_current)
-    ).scalar()) if time_ids_current else 0
-    
-    # Previous year value
-    time_previous = db.query(DimTime).filter(DimTime.year == year - 1).all()
-    time_ids_previous = [t.time_id for t in time_previous]
-    
-    value_previous = clean_value(db.query(func.sum(FactProductPerformance.sales_value)).filter(
-        FactProductPerformance.time_id.in_(time_ids_previous)
-    ).scalar()) if time_ids_previous else 0
+    ).where(
+        FactSales.time_id == select(period.c.time_id).scalar_subquery()
+    ).cte('sales')
+    
+    products = select(
+        func.sum(case((DimTime.year == year, FactProductPerformance.sales_value))).label('value_current'),
+        func.sum(case((DimTime.year == year - 1, FactProductPerformance.sales_value))).label('value_previous')
+    ).join(
+        DimTime, FactProductPerformance.time_id == DimTime.time_id
+    ).where(
+        DimTime.year.in_([year, year - 1])
+    ).cte('products')
+    
+    product_count = select(func.count(DimProduct.product_id)).where(DimProduct.is_active == 1).scalar_subquery()
+    
+    return select(
+        select(period.c.time_id).scalar_subquery().label('time_id'),
+        select(period.c.month_name).scalar_subquery().label('month_name'),
+        select(period.c.fiscal_year).scalar_subquery().label('fiscal_year'),
+        sales,
+        product_count.label('product_count'),
+        products
+    ).select_from(sales.join(products, true()))
+
+
+def dashboard_summary_response(row, month: int, year: int) -> dict:
+    """Dashboard summary response built from the row of dashboard_summary_query"""
+    if row.time_id is None:
+        return {
+            'sales': {'total_regions': 0, 'total_sales_target': 0, 'total_gross_sales': 0, 'total_net_sales': 0, 'overall_achievement_pct': 0},
+            'collection': {'total_coll_target': 0, 'total_collection': 0, 'overall_coll_ach_pct': 0, 'cash_collection': 0, 'credit_collection': 0, 'seed_collection': 0},
+            'products': {'total_products': 0, 'total_value_current': 0, 'total_value_previous': 0, 'overall_growth_pct': 0},
+            'month': month, 'year': year
+        }
+    
+    total_target = clean_value(row.total_target)
+    total_net = clean_value(row.total_net)
+    coll_target = clean_value(row.coll_target)
+    total_coll = clean_value(row.total_coll)
+    value_current = clean_value(row.value_current)
+    value_previous = clean_value(row.value_previous)
     
     return {
         'sales': {
-            'total_regions': sales_data.count or 0,
+            'total_regions': row.count or 0,
             'total_sales_target': total_target,
-            'total_gross_sales': total_gross,
+            'total_gross_sales': clean_value(row.total_gross),
             'total_net_sales': total_net,
             'overall_achievement_pct': round((total_net / total_target * 100), 2) if total_target else 0
         },
@@ -457,48 +695,63 @@ def get_dashboard_summary(month: int = 11, year: int = 2025, db: Session = Depen
             'total_coll_target': coll_target,
             'total_collection': total_coll,
             'overall_coll_ach_pct': round((total_coll / coll_target * 100), 2) if coll_target else 0,
-            'cash_collection': cash_coll,
-            'credit_collection': credit_coll,
-            'seed_collection': seed_coll
+            'cash_collection': clean_value(row.cash_coll),
+            'credit_collection': clean_value(row.credit_coll),
+            'seed_collection': clean_value(row.seed_coll)
         },
         'products': {
-            'total_products': product_count,
+            'total_products': row.product_count or 0,
             'total_value_current': value_current,
             'total_value_previous': value_previous,
             'overall_growth_pct': round(((value_current - value_previous) / value_previous * 100), 2) if value_previous else 0
         },
         'month': month,
         'year': year,
-        'month_name': time_dim.month_name,
-        'fiscal_year': time_dim.fiscal_year
+        'month_name': row.month_name,
+        'fiscal_year': row.fiscal_year
     }
 
 
+@router.get("/dashboard-summary")
+@result_cache.cached('dashboard-summary', lambda month, year: [(None, year), (None, year - 1)], dimensions=True)
+async def get_dashboard_summary(month: int = 11, year: int = 2025, db: AsyncSession = Depends(get_async_db)):
+    """Get dashboard summary with calculated metrics from fact tables (one query)"""
+    
+    row = (await db.execute(dashboard_summary_query(month, year))).one()
+    return dashboard_summary_response(row, month, year)
+
+
 # ============================================================================
 # ANALYTICS ENDPOINTS
 # ============================================================================
 
 @router.get("/analytics/sales-by-zone")
-def get_sales_by_zone(month: int = None, year: int = None, db: Session = Depends(get_db)):
-    """Get sales aggregated by zone"""
-    
-    query = db.query(
-        DimRegion.zone,
-        func.sum(FactSales.sales_target).label('total_target'),
-        func.sum(FactSales.net_sales).label('total_sales'),
-        func.sum(FactSales.total_collection).label('total_collection')
-    ).join(
-        FactSales, DimRegion.region_id == FactSales.region_id
+@result_cache.cached('sales-by-zone', lambda month, year: [(month, year)])
+async def get_sales_by_zone(month: int = None, year: int = None, db: AsyncSession = Depends(get_async_db)):
+    """Get sales aggregated by zone (from agg_sales_zone_month, falling back to fact_sales)"""
+    
+    query = select(
+        AggSalesZoneMonth.zone,
+        func.sum(AggSalesZoneMonth.sales_target).label('total_target'),
+        func.sum(AggSalesZoneMonth.net_sales).label('total_sales'),
+        func.sum(AggSalesZoneMonth.total_collection).label('total_collection')
     ).join(
-        DimTime, FactSales.time_id == DimTime.time_id
+        DimTime, AggSalesZoneMonth.time_id == DimTime.time_id
     )
-    
-    if month:
-        query = query.filter(DimTime.month == month)
-    if year:
-        query = query.filter(DimTime.year == year)
-    
-    results = query.group_by(DimRegion.zone).all()
+    results = (await db.execute(filter_period(query, month, year).group_by(AggSalesZoneMonth.zone))).all()
+    
+    if not results:
+        query = select(
+            DimRegion.zone,
+            func.sum(FactSales.sales_target).label('total_target'),
+            func.sum(FactSales.net_sales).label('total_sales'),
+            func.sum(FactSales.total_collection).label('total_collection')
+        ).join(
+            FactSales, DimRegion.region_id == FactSales.region_id
+        ).join(
+            DimTime, FactSales.time_id == DimTime.time_id
+        )
+        results = (await db.execute(filter_period(query, month, year).group_by(DimRegion.zone))).all()
     
     return [{
         'zone': r[0],
@@ -509,17 +762,64 @@ def get_sales_by_zone(month: int = None, year: int = None, db: Session = Depends
     } for r in results]
 
 
+@router.get("/analytics/sales-by-division")
+@result_cache.cached('sales-by-division', lambda month, year: [(month, year)])
+async def get_sales_by_division(month: int = None, year: int = None, db: AsyncSession = Depends(get_async_db)):
+    """Get sales aggregated by division (from agg_sales_division_month, falling back to fact_sales)"""
+    
+    query = select(
+        AggSalesDivisionMonth.division,
+        AggSalesDivisionMonth.zone,
+        func.sum(AggSalesDivisionMonth.sales_target).label('total_target'),
+        func.sum(AggSalesDivisionMonth.net_sales).label('total_sales'),
+        func.sum(AggSalesDivisionMonth.total_collection).label('total_collection'),
+        func.sum(AggSalesDivisionMonth.outstanding).label('outstanding')
+    ).join(
+        DimTime, AggSalesDivisionMonth.time_id == DimTime.time_id
+    )
+    results = (await db.execute(filter_period(query, month, year).group_by(
+        AggSalesDivisionMonth.division, AggSalesDivisionMonth.zone
+    ))).all()
+    
+    if not results:
+        query = select(
+            DimRegion.division,
+            DimRegion.zone,
+            func.sum(FactSales.sales_target).label('total_target'),
+            func.sum(FactSales.net_sales).label('total_sales'),
+            func.sum(FactSales.total_collection).label('total_collection'),
+            func.sum(FactSales.outstanding).label('outstanding')
+        ).join(
+            FactSales, DimRegion.region_id == FactSales.region_id
+        ).join(
+            DimTime, FactSales.time_id == DimTime.time_id
+        )
+        results = (await db.execute(
+            filter_period(query, month, year).group_by(DimRegion.division, DimRegion.zone)
+        )).all()
+    
+    return [{
+        'division': r[0],
+        'zone': r[1],
+        'total_target': clean_value(r[2]),
+        'total_sales': clean_value(r[3]),
+        'total_collection': clean_value(r[4]),
+        'outstanding': clean_value(r[5]),
+        'achievement_pct': round((clean_value(r[3]) / clean_value(r[2]) * 100), 2) if clean_value(r[2]) else 0
+    } for r in results]
+
+
 @router.get("/analytics/top-products")
-def get_top_products(limit: int = 10, year: int = 2025, db: Session = Depends(get_db)):
+@result_cache.cached('top-products', lambda limit, year: [(None, year)])
+async def get_top_products(limit: int = 10, year: int = 2025, db: AsyncSession = Depends(get_async_db)):
     """Get top products by sales value"""
     
-    time_periods = db.query(DimTime).filter(DimTime.year == year).all()
-    time_ids = [t.time_id for t in time_periods]
+    time_ids = (await db.execute(select(DimTime.time_id).where(DimTime.year == year))).scalars().all()
     
     if not time_ids:
         return []
     
-    results = db.query(
+    results = (await db.execute(select(
         DimProduct.product_id,
         DimProduct.product_name,
         DimProduct.product_category,
@@ -527,13 +827,13 @@ def get_top_products(limit: int = 10, year: int = 2025, db: Session = Depends(ge
         func.sum(FactProductPerformance.sales_volume).label('total_volume')
     ).join(
         FactProductPerformance, DimProduct.product_id == FactProductPerformance.product_id
-    ).filter(
+    ).where(
         FactProductPerformance.time_id.in_(time_ids)
     ).group_by(
         DimProduct.product_id, DimProduct.product_name, DimProduct.product_category
     ).order_by(
         func.sum(FactProductPerformance.sales_value).desc()
-    ).limit(limit).all()
+    ).limit(limit))).all()
     
     return [{
         'product_id': r[0],
@@ -545,23 +845,40 @@ def get_top_products(limit: int = 10, year: int = 2025, db: Session = Depends(ge
 
 
 @router.get("/analytics/monthly-trend")
-def get_monthly_trend(year: int = 2025, db: Session = Depends(get_db)):
-    """Get monthly sales and collection trend"""
+@result_cache.cached('monthly-trend', lambda year: [(None, year)])
+async def get_monthly_trend(year: int = 2025, db: AsyncSession = Depends(get_async_db)):
+    """Get monthly sales and collection trend (from agg_sales_month, falling back to fact_sales)"""
     
-    results = db.query(
+    results = (await db.execute(select(
         DimTime.month,
         DimTime.month_name,
-        func.sum(FactSales.net_sales).label('total_sales'),
-        func.sum(FactSales.total_collection).label('total_collection')
+        func.sum(AggSalesMonth.net_sales).label('total_sales'),
+        func.sum(AggSalesMonth.total_collection).label('total_collection')
     ).join(
-        FactSales, DimTime.time_id == FactSales.time_id
-    ).filter(
+        AggSalesMonth, DimTime.time_id == AggSalesMonth.time_id
+    ).where(
         DimTime.year == year
     ).group_by(
         DimTime.month, DimTime.month_name
     ).order_by(
         DimTime.month
-    ).all()
+    ))).all()
+    
+    if not results:
+        results = (await db.execute(select(
+            DimTime.month,
+            DimTime.month_name,
+            func.sum(FactSales.net_sales).label('total_sales'),
+            func.sum(FactSales.total_collection).label('total_collection')
+        ).join(
+            FactSales, DimTime.time_id == FactSales.time_id
+        ).where(
+            DimTime.year == year
+        ).group_by(
+            DimTime.month, DimTime.month_name
+        ).order_by(
+            DimTime.month
+        ))).all()
     
     return [{
         'month': r[0],
@@ -155,3 +155,19 @@ class FileUploadResponse(BaseModel):
     file_type: str
     records_processed: int
     details: Optional[dict] = None
+
+
+# Batch Upload Response
+class BatchFileResult(BaseModel):
+    filename: str
+    file_type: str
+    status: str
+    message: str
+    records_processed: int = 0
+    details: Optional[dict] = None
+
+
+class BatchUploadResponse(BaseModel):
+    success: bool
+    message: str
+    files: List[BatchFileResult]
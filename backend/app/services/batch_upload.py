@@ -0,0 +1,260 @@
+"""
+Batch Uploads
+=============
+
+Loads a month-end set of Sales & Collection and Product Comparison workbooks
+in one request:
+
+1. Uploads are expanded (ZIP archives contribute their Excel members) and
+   classified with detect_file_type.
+2. Workbooks are parsed concurrently in a process pool. Parsing is CPU-bound
+   pandas/openpyxl work, so threads would serialize on the GIL.
+3. The parsed records are written in a single transaction with the same
+   per-period replace as single uploads. If several files cover the same
+   file type and period, the last one wins and the earlier ones are reported
+   as superseded, and files identical to the last upload for their period
+   are skipped (see app.services.upload_ledger). Any write error rolls back
+   the whole batch.
+"""
+
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, List, Tuple
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models_star_schema import FactSales, FactProductPerformance, get_month_name
+from app.services.dimension_cache import dimension_cache
+from app.services.result_cache import result_cache
+from app.services.data_versions import bump_versions, upload_tables
+from app.services.sales_aggregates import refresh_sales_aggregates
+from app.services.fact_writer import write_fact_rows, DEFAULT_WRITE_MODE
+from app.services.file_processor import (
+    detect_file_type, parse_upload, sales_fact_rows, product_fact_rows,
+    delete_existing_sales_data, delete_existing_product_data,
+    period_upserter, upsert_details, SALES_FACT_KEY, PRODUCT_FACT_KEY,
+    sales_upload_message, product_upload_message
+)
+from app.services.upload_ledger import (
+    content_hash, find_duplicate, record_upload, duplicate_result, duplicate_message
+)
+
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+# Fact table written for each file type
+BATCH_FACT_TABLES = {
+    'sales_collection': 'fact_sales',
+    'product_comparison': 'fact_product_performance',
+}
+
+
+def expand_uploads(files: List[Tuple[str, bytes]]) -> Tuple[List[Tuple[str, bytes]], List[Dict[str, Any]]]:
+    """
+    Replace ZIP archives by their Excel members. Returns the (filename,
+    content) pairs to process and failed results for unreadable archives.
+    """
+    expanded, failed = [], []
+    for filename, content in files:
+        if not filename.lower().endswith('.zip'):
+            expanded.append((filename, content))
+            continue
+        
+        try:
+            with zipfile.ZipFile(BytesIO(content)) as archive:
+                for info in archive.infolist():
+                    member = os.path.basename(info.filename)
+                    # Skip folders and macOS / Office metadata files
+                    if info.is_dir() or '__MACOSX' in info.filename or member.startswith(('.', '~$')):
+                        continue
+                    expanded.append((member, archive.read(info)))
+        except zipfile.BadZipFile:
+            failed.append(file_result(filename, 'unknown', 'failed', "Invalid ZIP archive"))
+    
+    return expanded, failed
+
+
+def file_result(filename: str, file_type: str, status: str, message: str,
+                details: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Result entry for one file of a batch"""
+    details = details or {}
+    return {
+        'filename': filename,
+        'file_type': file_type,
+        'status': status,
+        'message': message,
+        'records_processed': details.get('fact_sales_inserted', 0) + details.get('fact_records_inserted', 0),
+        'details': details
+    }
+
+
+def _parse_file(content: bytes, filename: str, file_type: str) -> Dict[str, Any]:
+    """Process pool entry point"""
+    return parse_upload(BytesIO(content), filename, file_type)
+
+
+def parse_files(files: List[Tuple[str, bytes, str]], max_workers: int) -> List[Any]:
+    """
+    Parse (filename, content, file_type) entries, in worker processes when
+    more than one worker is allowed. Returns the parsed upload or the
+    raised exception for every entry, in input order.
+    """
+    if max_workers <= 1 or len(files) <= 1:
+        parsed = []
+        for filename, content, file_type in files:
+            try:
+                parsed.append(_parse_file(content, filename, file_type))
+            except Exception as e:
+                parsed.append(e)
+        return parsed
+    
+    # spawn: forking the API process would copy its threads and open connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(files)), mp_context=context) as pool:
+        futures = [pool.submit(_parse_file, content, filename, file_type) for filename, content, file_type in files]
+        return [future.exception() or future.result() for future in futures]
+
+
+def write_sales_upload(db: Session, parsed: Dict[str, Any], write_mode: str) -> Dict[str, Any]:
+    """Replace the Sales & Collection facts of a parsed upload's period (no commit)"""
+    month, year = parsed['month'], parsed['year']
+    time_id = dimension_cache.resolve_time(db, month, year)
+    upserter = period_upserter(db, FactSales, SALES_FACT_KEY, [time_id], write_mode)
+    deleted_count = 0 if upserter else delete_existing_sales_data(db, time_id)
+    
+    fact_rows = sales_fact_rows(db, parsed['records'], time_id)
+    details = {
+        'month': month,
+        'year': year,
+        'month_name': get_month_name(month),
+        'deleted_records': deleted_count,
+        'regions_processed': len(parsed['records']),
+        'fact_sales_inserted': upserter.write(fact_rows) if upserter else write_fact_rows(db, FactSales, fact_rows, write_mode)
+    }
+    if upserter:
+        details.update(upsert_details(upserter))
+    refresh_sales_aggregates(db, [time_id])
+    return details
+
+
+def write_product_upload(db: Session, parsed: Dict[str, Any], write_mode: str) -> Dict[str, Any]:
+    """Replace the product facts of a parsed upload's period and previous year (no commit)"""
+    month, year = parsed['month'], parsed['year']
+    time_prev_id = dimension_cache.resolve_time(db, month, year - 1)
+    time_curr_id = dimension_cache.resolve_time(db, month, year)
+    upserter = period_upserter(db, FactProductPerformance, PRODUCT_FACT_KEY, [time_prev_id, time_curr_id], write_mode)
+    if upserter:
+        deleted_count = 0
+    else:
+        deleted_count = delete_existing_product_data(db, time_prev_id) + delete_existing_product_data(db, time_curr_id)
+    
+    fact_rows = product_fact_rows(db, parsed['records'], time_prev_id, time_curr_id)
+    details = {
+        'month': month,
+        'year': year,
+        'month_name': get_month_name(month),
+        'deleted_records': deleted_count,
+        'products_processed': len(parsed['records']),
+        'fact_records_inserted': (upserter.write(fact_rows) if upserter
+                                  else write_fact_rows(db, FactProductPerformance, fact_rows, write_mode))
+    }
+    if upserter:
+        details.update(upsert_details(upserter))
+    return details
+
+
+def process_batch(files: List[Tuple[str, bytes]], db: Session, write_mode: str = DEFAULT_WRITE_MODE,
+                  max_workers: int = None, force: bool = False) -> Dict[str, Any]:
+    """
+    Parse and load a batch of uploads. files are (filename, content) pairs;
+    returns {'success', 'message', 'files'} with one result per workbook.
+    force reloads files that the upload ledger reports as unchanged.
+    """
+    max_workers = max_workers or settings.BATCH_PARSE_WORKERS
+    entries, results = expand_uploads(files)
+    
+    # Classify every workbook, parse the ones we understand
+    to_parse = []
+    for filename, content in entries:
+        file_type = detect_file_type(filename)
+        if not filename.lower().endswith(EXCEL_EXTENSIONS):
+            results.append(file_result(filename, file_type, 'failed', "Only Excel files (.xlsx, .xls) are supported"))
+        elif file_type == 'unknown':
+            results.append(file_result(filename, file_type, 'failed',
+                                       "Unknown file type. Filename should contain 'Sales_Collection' or 'Product_Comparison'."))
+        else:
+            to_parse.append((filename, content, file_type))
+    
+    parsed_files = []
+    for (filename, content, file_type), parsed in zip(to_parse, parse_files(to_parse, max_workers)):
+        if isinstance(parsed, Exception):
+            results.append(file_result(filename, file_type, 'failed', f"Error processing file: {str(parsed)}"))
+        else:
+            parsed['content_hash'] = content_hash(BytesIO(content))
+            parsed_files.append((filename, file_type, parsed))
+    
+    # Last file wins for each file type and period
+    latest = {(file_type, parsed['month'], parsed['year']): index
+              for index, (_, file_type, parsed) in enumerate(parsed_files)}
+    
+    loaded = []
+    try:
+        dimension_cache.preload(db)
+        for index, (filename, file_type, parsed) in enumerate(parsed_files):
+            winner = latest[(file_type, parsed['month'], parsed['year'])]
+            if winner != index:
+                results.append(file_result(filename, file_type, 'superseded',
+                                           f"Skipped: {parsed_files[winner][0]} covers the same period"))
+                continue
+            
+            duplicate = None if force else find_duplicate(db, parsed['content_hash'], file_type,
+                                                          parsed['month'], parsed['year'])
+            if duplicate:
+                results.append(file_result(filename, file_type, 'unchanged',
+                                           duplicate_message(duplicate), duplicate_result(duplicate)))
+                continue
+            
+            if file_type == 'sales_collection':
+                details = write_sales_upload(db, parsed, write_mode)
+                message = sales_upload_message(details)
+            else:
+                details = write_product_upload(db, parsed, write_mode)
+                message = product_upload_message(details)
+            record_upload(db, parsed['content_hash'], file_type, filename, details)
+            loaded.append(file_result(filename, file_type, 'processed', message, details))
+        
+        changed_dimensions = dimension_cache.changed_tables(db)
+        for file_type, fact_table in BATCH_FACT_TABLES.items():
+            if any(r['file_type'] == file_type for r in loaded):
+                bump_versions(db, upload_tables(fact_table, changed_dimensions))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        rolled_back = [file_result(r['filename'], r['file_type'], 'failed', "Rolled back: batch could not be committed")
+                       for r in loaded]
+        return {
+            'success': False,
+            'message': f"Error processing batch, no data was written: {str(e)}",
+            'files': results + rolled_back
+        }
+    
+    # Product comparison files also rewrite the previous year
+    periods = [(r['details']['month'], r['details']['year'] - offset) for r in loaded
+               for offset in ((0, 1) if r['file_type'] == 'product_comparison' else (0,))]
+    result_cache.invalidate_periods(periods, dimensions=bool(changed_dimensions))
+    
+    results += loaded
+    failed = sum(1 for r in results if r['status'] == 'failed')
+    unchanged = sum(1 for r in results if r['status'] == 'unchanged')
+    message = f"Processed {len(loaded)} of {len(results)} files."
+    if unchanged:
+        message += f" {unchanged} unchanged."
+    if failed:
+        message += f" {failed} failed."
+    return {
+        'success': failed == 0,
+        'message': message,
+        'files': results
+    }
@@ -0,0 +1,121 @@
+"""
+Calendar Dimension
+==================
+
+Pre-generated calendar for the time dimensions:
+- dim_time: one row per month (the grain of every fact table)
+- dim_date: one row per day, linked to its month (optional)
+
+generate_calendar() builds a whole year range and writes it with a single
+INSERT ... ON CONFLICT (date) DO NOTHING per table, so it is idempotent and
+safe to run at every startup. With the configured range pre-seeded, uploads
+resolve their period from the dimension key cache without writing dim_time.
+
+is_current_month / is_current_year are relative to today, so they go stale
+at every month and year boundary. refresh_current_flags() recomputes them
+with one UPDATE that only touches rows whose flags actually change; the API
+runs it at startup and then periodically (CALENDAR_REFRESH_INTERVAL).
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, update, case, or_, and_
+from sqlalchemy.orm import Session
+from app.models_star_schema import DimTime, DimDate
+from app.services.dimension_cache import time_dimension_row
+from app.services.data_versions import bump_versions
+from app.services.fact_writer import UPSERT_DIALECTS
+
+
+def month_rows(start_year: int, end_year: int, today: Optional[date] = None) -> List[dict]:
+    """dim_time rows of every month from January start_year to December end_year"""
+    today = today or date.today()
+    return [time_dimension_row(month, year, today)
+            for year in range(start_year, end_year + 1) for month in range(1, 13)]
+
+
+def day_rows(start_year: int, end_year: int, time_ids: Dict[tuple, int]) -> List[dict]:
+    """dim_date rows of every day in the range; time_ids maps (month, year) to time_id"""
+    rows = []
+    day = date(start_year, 1, 1)
+    last = date(end_year, 12, 31)
+    while day <= last:
+        rows.append({
+            'date': day,
+            'day': day.day,
+            'day_of_week': day.isoweekday(),
+            'day_name': day.strftime('%A'),
+            'is_weekend': 1 if day.isoweekday() in (5, 6) else 0,
+            'month': day.month,
+            'year': day.year,
+            'time_id': time_ids[(day.month, day.year)],
+        })
+        day += timedelta(days=1)
+    return rows
+
+
+def insert_missing_dates(db: Session, model, rows: List[dict]) -> int:
+    """Insert the rows whose date is not stored yet, returns the number inserted"""
+    if not rows:
+        return 0
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    
+    if dialect in UPSERT_DIALECTS:
+        stmt = UPSERT_DIALECTS[dialect](table).on_conflict_do_nothing(index_elements=['date'])
+        return len(db.execute(stmt.returning(table.c.date), rows).all())
+    
+    # No ON CONFLICT: skip the dates already stored
+    existing = set(db.execute(
+        select(table.c.date).where(table.c.date.between(rows[0]['date'], rows[-1]['date']))
+    ).scalars())
+    rows = [row for row in rows if row['date'] not in existing]
+    if rows:
+        db.execute(table.insert(), rows)
+    return len(rows)
+
+
+def generate_calendar(db: Session, start_year: int, end_year: int, daily: bool = False,
+                      today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Insert the missing months (and days when daily is set) of start_year to
+    end_year and commit. Returns the number of rows added per table.
+    """
+    if start_year > end_year:
+        raise ValueError(f"start_year {start_year} is after end_year {end_year}")
+    
+    added = {'dim_time': insert_missing_dates(db, DimTime, month_rows(start_year, end_year, today))}
+    if daily:
+        time_ids = {(month, year): time_id for month, year, time_id in db.execute(
+            select(DimTime.month, DimTime.year, DimTime.time_id)
+            .where(DimTime.year.between(start_year, end_year))
+            .order_by(DimTime.time_id.desc())
+        )}
+        added['dim_date'] = insert_missing_dates(db, DimDate, day_rows(start_year, end_year, time_ids))
+    
+    if added['dim_time']:
+        bump_versions(db, ['dim_time'])
+    db.commit()
+    return added
+
+
+def refresh_current_flags(db: Session, today: Optional[date] = None) -> int:
+    """
+    Recompute is_current_month / is_current_year of dim_time for today and
+    commit. Returns the number of rows changed (0 on most runs).
+    """
+    today = today or date.today()
+    current_month = case((and_(DimTime.month == today.month, DimTime.year == today.year), 1), else_=0)
+    current_year = case((DimTime.year == today.year, 1), else_=0)
+    
+    changed = db.execute(
+        update(DimTime)
+        .where(or_(DimTime.is_current_month.is_distinct_from(current_month),
+                   DimTime.is_current_year.is_distinct_from(current_year)))
+        .values(is_current_month=current_month, is_current_year=current_year)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if changed:
+        bump_versions(db, ['dim_time'])
+    db.commit()
+    return changed
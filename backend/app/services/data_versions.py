@@ -0,0 +1,68 @@
+"""
+Data Versions
+=============
+
+Per-table change counters in data_version. Uploads bump the counters of the
+tables they write inside their own transaction, so a reader sees a new
+version exactly when the new data is visible.
+
+Read endpoints derive strong ETags from the versions of the tables they
+query (see etag_for); a matching If-None-Match can then be answered with
+304 Not Modified after one primary-key lookup instead of the full query.
+"""
+
+import hashlib
+from typing import Dict, Iterable, List
+from sqlalchemy import select, update, insert, func
+from sqlalchemy.orm import Session
+from app.models_star_schema import DataVersion
+
+
+DIMENSION_TABLES = ['dim_time', 'dim_region', 'dim_product']
+FACT_TABLES = ['fact_sales', 'fact_product_performance']
+TRACKED_TABLES = DIMENSION_TABLES + FACT_TABLES
+
+
+def ensure_versions(db: Session) -> None:
+    """Create missing counters for the tracked tables (run at startup)"""
+    existing = set(db.execute(select(DataVersion.table_name)).scalars())
+    missing = [name for name in TRACKED_TABLES if name not in existing]
+    if missing:
+        db.execute(insert(DataVersion), [{'table_name': name, 'version': 0} for name in missing])
+        db.commit()
+
+
+def bump_versions(db: Session, tables: Iterable[str]) -> None:
+    """Increment the counters of changed tables (the caller commits)"""
+    tables = sorted(set(tables))
+    bumped = db.execute(
+        update(DataVersion).where(DataVersion.table_name.in_(tables))
+        .values(version=DataVersion.version + 1, updated_at=func.now())
+    ).rowcount
+    if bumped < len(tables):
+        # Counters not created yet (ensure_versions has not run)
+        existing = set(db.execute(
+            select(DataVersion.table_name).where(DataVersion.table_name.in_(tables))
+        ).scalars())
+        db.execute(insert(DataVersion), [{'table_name': name, 'version': 1}
+                                         for name in tables if name not in existing])
+
+
+def upload_tables(fact_table: str, changed_dimensions: List[str]) -> List[str]:
+    """Tables whose version an upload into fact_table bumps"""
+    return [fact_table] + list(changed_dimensions)
+
+
+def get_versions(db: Session, tables: Iterable[str]) -> Dict[str, int]:
+    """Current counters of the given tables (0 if never bumped)"""
+    tables = list(tables)
+    versions = dict(db.execute(
+        select(DataVersion.table_name, DataVersion.version).where(DataVersion.table_name.in_(tables))
+    ).all())
+    return {name: versions.get(name, 0) for name in tables}
+
+
+def etag_for(path: str, query: Iterable, versions: Dict[str, int]) -> str:
+    """Strong ETag for a resource path, its query parameters and table versions"""
+    parts = [path, repr(sorted(query)), repr(sorted(versions.items()))]
+    return '"' + hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32] + '"'
@@ -0,0 +1,272 @@
+"""
+Dimension Key Cache
+===================
+
+Process-wide cache of dimension surrogate keys used during uploads:
+- dim_region:  area_name -> region_id
+- dim_product: product_name -> product_id
+- dim_time:    (month, year) -> time_id
+
+The cache is preloaded once per upload with a single UNION ALL query.
+Members missing from the cache are inserted in one batch per dimension
+(INSERT ... ON CONFLICT DO NOTHING on the natural key, then a lookup of the
+names another writer added), so resolving N rows costs dictionary lookups
+instead of N SELECT + flush round-trips.
+
+Uploads run concurrently, so keys a session inserts are kept in that
+session's pending map (Session.info) and only published to the shared maps
+after its commit; a rollback or close discards them. Other uploads never see
+uncommitted keys.
+"""
+
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, insert, update, delete, func, literal, null, union_all, event
+from sqlalchemy.orm import Session
+from app.models_star_schema import (
+    DimTime, DimRegion, DimProduct, FactSales, FactProductPerformance,
+    get_month_name, get_month_short, get_quarter, get_fiscal_year
+)
+from app.services.data_versions import bump_versions
+from app.services.fact_writer import UPSERT_DIALECTS
+
+
+# Session.info entry holding the keys a session inserted but has not committed
+PENDING_KEYS = 'pending_dimension_keys'
+
+def time_dimension_row(month: int, year: int, today: Optional[date] = None) -> dict:
+    """Column values for a new dim_time row"""
+    today = today or date.today()
+    return {
+        'date': date(year, month, 1),
+        'day': 1,
+        'month': month,
+        'month_name': get_month_name(month),
+        'month_short': get_month_short(month),
+        'quarter': get_quarter(month),
+        'quarter_name': f"Q{get_quarter(month)}",
+        'year': year,
+        'fiscal_year': get_fiscal_year(month, year),
+        'is_current_month': 1 if (month == today.month and year == today.year) else 0,
+        'is_current_year': 1 if year == today.year else 0
+    }
+
+
+class DimensionKeyCache:
+    """Name -> surrogate key maps for dim_region, dim_product and dim_time"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.regions: Dict[str, int] = {}
+        self.products: Dict[str, int] = {}
+        self.times: Dict[Tuple[int, int], int] = {}
+
+    def invalidate(self) -> None:
+        """Drop every cached key (call after external dimension writes)"""
+        with self._lock:
+            self.regions = {}
+            self.products = {}
+            self.times = {}
+
+    def preload(self, db: Session) -> None:
+        """Load all dimension keys in a single round-trip"""
+        query = union_all(
+            select(literal('region').label('dim'), DimRegion.area_name.label('name'),
+                   null().label('month'), null().label('year'), DimRegion.region_id.label('key')),
+            select(literal('product'), DimProduct.product_name,
+                   null(), null(), DimProduct.product_id),
+            select(literal('time'), null(),
+                   DimTime.month, DimTime.year, DimTime.time_id),
+        )
+        
+        regions, products, times = {}, {}, {}
+        # Iterate highest key first so the lowest key wins for duplicate names,
+        # matching the first() lookups this cache replaces
+        for dim, name, month, year, key in sorted(db.execute(query).all(), key=lambda r: -r[4]):
+            if dim == 'region':
+                regions[name] = key
+            elif dim == 'product':
+                products[name] = key
+            else:
+                times[(month, year)] = key
+        
+        with self._lock:
+            self.regions = regions
+            self.products = products
+            self.times = times
+
+    def resolve_regions(self, db: Session, region_rows: Iterable[dict]) -> Dict[str, int]:
+        """
+        Resolve dim_region rows (dicts with at least area_name) to region_ids.
+        Missing regions are inserted in one batch; the first row seen for a
+        name provides its attributes.
+        """
+        new_rows = {}
+        for row in region_rows:
+            new_rows.setdefault(row['area_name'], row)
+        return self._resolve(db, self.regions, DimRegion.area_name, DimRegion.region_id, new_rows)
+
+    def resolve_products(self, db: Session, product_names: Iterable[str], category: str = None) -> Dict[str, int]:
+        """Resolve product names to product_ids, inserting missing products in one batch"""
+        new_rows = {}
+        for product_name in product_names:
+            new_rows.setdefault(product_name, {
+                'product_name': product_name,
+                'product_category': category or 'General',
+                'is_active': 1
+            })
+        return self._resolve(db, self.products, DimProduct.product_name, DimProduct.product_id, new_rows)
+
+    def resolve_time(self, db: Session, month: int, year: int) -> int:
+        """Resolve a (month, year) period to its time_id, creating it if needed"""
+        time_id = self.times.get((month, year))
+        if time_id is not None:
+            return time_id
+        
+        period = date(year, month, 1)
+        pending = self._pending(db)['dim_time']
+        time_id = pending.get(period)
+        if time_id is None:
+            inserted, committed = self._insert_missing(db, DimTime.date, DimTime.time_id,
+                                                       {period: time_dimension_row(month, year)})
+            pending.update(inserted)
+            time_id = inserted.get(period, committed.get(period))
+            if committed:
+                with self._lock:
+                    self.times[(month, year)] = time_id
+        return time_id
+
+    def changed_tables(self, db: Session) -> List[str]:
+        """Dimension tables the session inserted members into (not committed yet)"""
+        pending = db.info.get(PENDING_KEYS, {})
+        return [table for table, keys in pending.items() if keys]
+
+    def publish(self, pending: Dict[str, dict]) -> None:
+        """Add the keys of a committed session to the shared maps"""
+        with self._lock:
+            self.regions.update(pending['dim_region'])
+            self.products.update(pending['dim_product'])
+            self.times.update(((period.month, period.year), key) for period, key in pending['dim_time'].items())
+
+    def _pending(self, db: Session) -> Dict[str, dict]:
+        return db.info.setdefault(PENDING_KEYS, {'dim_time': {}, 'dim_region': {}, 'dim_product': {}})
+
+    def _resolve(self, db: Session, shared: dict, name_col, key_col, rows: Dict) -> Dict:
+        """Keys of the named rows: shared map, then this session's pending keys, then the database"""
+        pending = self._pending(db)[name_col.table.name]
+        keys, missing = {}, {}
+        for name, row in rows.items():
+            key = shared.get(name)
+            if key is None:
+                key = pending.get(name)
+            if key is None:
+                missing[name] = row
+            else:
+                keys[name] = key
+        
+        if missing:
+            inserted, committed = self._insert_missing(db, name_col, key_col, missing)
+            pending.update(inserted)
+            keys.update(inserted)
+            keys.update(committed)
+            if committed:
+                with self._lock:
+                    shared.update(committed)
+        return keys
+
+    def _insert_missing(self, db: Session, name_col, key_col, rows: Dict) -> Tuple[Dict, Dict]:
+        """
+        Insert the rows whose name is not stored yet in one statement. Returns
+        the keys this session inserted and the keys of names other writers
+        had already committed (an insert racing with an uncommitted one waits
+        on the unique index until that transaction ends).
+        """
+        table = name_col.table
+        dialect = db.get_bind().dialect.name
+        if dialect in UPSERT_DIALECTS:
+            stmt = UPSERT_DIALECTS[dialect](table).on_conflict_do_nothing(index_elements=[name_col.name])
+            inserted = dict(db.execute(stmt.returning(name_col, key_col), list(rows.values())).all())
+        else:
+            stored = set(db.execute(select(name_col).where(name_col.in_(list(rows)))).scalars())
+            new_rows = [row for name, row in rows.items() if name not in stored]
+            inserted = dict(db.execute(insert(table).returning(name_col, key_col), new_rows).all()) if new_rows else {}
+        
+        committed = {}
+        others = [name for name in rows if name not in inserted]
+        if others:
+            # Highest key first so the lowest key wins, as in preload()
+            for name, key in db.execute(
+                select(name_col, key_col).where(name_col.in_(others)).order_by(key_col.desc())
+            ):
+                committed[name] = key
+        return inserted, committed
+
+
+# Shared by every upload handled in this process
+dimension_cache = DimensionKeyCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending_keys(session: Session) -> None:
+    pending = session.info.pop(PENDING_KEYS, None)
+    if pending:
+        dimension_cache.publish(pending)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _discard_pending_keys(session: Session, transaction) -> None:
+    # Rolled back or closed without commit (after_commit already took them otherwise)
+    if transaction.parent is None:
+        session.info.pop(PENDING_KEYS, None)
+
+
+# Name-keyed dimensions: natural key, surrogate key and the fact columns referencing it
+NATURAL_KEYS = [
+    (DimRegion.area_name, DimRegion.region_id, [FactSales.region_id]),
+    (DimProduct.product_name, DimProduct.product_id, [FactProductPerformance.product_id]),
+]
+
+
+def ensure_unique_members(db: Session) -> Dict[str, int]:
+    """
+    Create the unique natural-key indexes that ON CONFLICT relies on in
+    databases created before them (run at startup). Duplicate members are
+    first merged into the lowest key, the one uploads always resolved to;
+    a period with facts under both keys keeps the lowest key's fact.
+    Returns the number of merged members per table.
+    """
+    merged = {}
+    for name_col, key_col, fact_columns in NATURAL_KEYS:
+        table = name_col.table
+        canonical = (
+            select(name_col.label('name'), func.min(key_col).label('keep'))
+            .group_by(name_col).having(func.count() > 1).subquery()
+        )
+        duplicates = db.execute(
+            select(key_col, canonical.c.keep).join(canonical, name_col == canonical.c.name)
+            .where(key_col != canonical.c.keep)
+        ).all()
+        
+        for duplicate, keep in duplicates:
+            for fact_col in fact_columns:
+                fact = fact_col.table
+                db.execute(delete(fact).where(
+                    fact_col == duplicate,
+                    fact.c.time_id.in_(select(fact.c.time_id).where(fact_col == keep))
+                ))
+                db.execute(update(fact).where(fact_col == duplicate).values({fact_col.name: keep}))
+        if duplicates:
+            db.execute(delete(table).where(key_col.in_([duplicate for duplicate, _ in duplicates])))
+            merged[table.name] = len(duplicates)
+        
+        for index in table.indexes:
+            if index.unique:
+                index.create(db.connection(), checkfirst=True)
+    
+    if merged:
+        fact_tables = [fact_col.table.name for name_col, _, fact_columns in NATURAL_KEYS
+                       if name_col.table.name in merged for fact_col in fact_columns]
+        bump_versions(db, list(merged) + fact_tables)
+    db.commit()
+    return merged
@@ -0,0 +1,57 @@
+"""
+Fact Export
+===========
+
+Encoders turning a stream of fact records into NDJSON or CSV text for the
+/api/export endpoints. Records are buffered into chunks of CHUNK_ROWS rows
+so the response is written in a few large pieces rather than one per row.
+"""
+
+import csv
+import io
+import json
+from typing import Dict, Iterable, Iterator, List
+
+
+CHUNK_ROWS = 1000
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+
+def ndjson_chunks(records: Iterable[Dict]) -> Iterator[str]:
+    """One JSON object per line"""
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, default=str))
+        if len(lines) >= CHUNK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def csv_chunks(records: Iterable[Dict], field_names: List[str]) -> Iterator[str]:
+    """Header row followed by one row per record"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=field_names, lineterminator='\n')
+    writer.writeheader()
+    rows = 0
+    for record in records:
+        writer.writerow(record)
+        rows += 1
+        if rows >= CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
+
+
+def encode_records(records: Iterable[Dict], field_names: List[str], export_format: str) -> Iterator[str]:
+    if export_format == 'csv':
+        return csv_chunks(records, field_names)
+    return ndjson_chunks(records)
@@ -0,0 +1,165 @@
+"""
+Fact Queries
+============
+
+Column-projected, keyset-paginated reads of the fact tables behind
+/api/sales, /api/collections and /api/product-sales.
+
+Each listing maps response keys to columns. Only the requested columns are
+selected (as plain rows, no ORM entities), and rows are ordered by fact_id
+so a page ends with a cursor: the next page is `fact_id > cursor`, which
+stays an index range scan however deep the client pages. count() and page()
+run on the async session of the read endpoints; stream() reads the same
+projection through a server-side cursor of a sync session for the exports.
+"""
+
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models_star_schema import DimTime, DimRegion, DimProduct, FactSales, FactProductPerformance
+
+
+class FactListing:
+    """Response fields of a fact endpoint and the joins they need"""
+
+    def __init__(self, model, joins: List[Tuple[Any, Any]], attributes: Dict[str, Any], measures: Dict[str, Any]):
+        self.model = model
+        self.joins = joins
+        self.fields = {**attributes, **measures}
+        self.measures = set(measures)
+
+    def parse_fields(self, fields: Optional[str]) -> List[str]:
+        """Requested field names (all when fields is empty), ValueError for unknown ones"""
+        if not fields:
+            return list(self.fields)
+        requested = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in requested if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        return requested
+
+    def _filtered(self, query, month: Optional[int], year: Optional[int]):
+        query = query.select_from(self.model)
+        for target, on_clause in self.joins:
+            query = query.join(target, on_clause)
+        if month:
+            query = query.filter(DimTime.month == month)
+        if year:
+            query = query.filter(DimTime.year == year)
+        return query
+
+    async def count(self, db: AsyncSession, month: Optional[int] = None, year: Optional[int] = None) -> int:
+        """Number of rows matching the filters"""
+        return (await db.execute(self._filtered(select(func.count(self.model.fact_id)), month, year))).scalar()
+
+    async def page(self, db: AsyncSession, field_names: List[str], month: Optional[int] = None,
+                   year: Optional[int] = None, cursor: Optional[int] = None,
+                   limit: Optional[int] = None) -> Tuple[List[Any], Optional[int]]:
+        """
+        Rows after cursor (all rows when limit is None) with only the given
+        fields as labelled columns, plus the cursor of the next page (None on
+        the last page).
+        """
+        columns = [self.fields[name].label(name) for name in field_names]
+        query = self._filtered(select(self.model.fact_id.label('_cursor'), *columns), month, year)
+        if cursor is not None:
+            query = query.filter(self.model.fact_id > cursor)
+        query = query.order_by(self.model.fact_id)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        
+        rows = (await db.execute(query)).all()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]._cursor
+        return rows, next_cursor
+
+    def stream(self, db: Session, field_names: List[str], month: Optional[int] = None, year: Optional[int] = None,
+               batch_size: int = 5000, start: Optional[date] = None, end: Optional[date] = None,
+               chronological: bool = False) -> Iterator[Any]:
+        """
+        All matching rows, fetched batch_size rows at a time from a server-side
+        cursor so memory stays flat however long the history is. start / end
+        restrict the rows to a range of months (inclusive); rows come in
+        fact_id order, or by month first when chronological is set.
+        """
+        columns = [self.fields[name].label(name) for name in field_names]
+        query = self._filtered(select(*columns), month, year)
+        if start:
+            query = query.filter(DimTime.date >= start)
+        if end:
+            query = query.filter(DimTime.date <= end)
+        order = [DimTime.date, self.model.fact_id] if chronological else [self.model.fact_id]
+        query = query.order_by(*order)
+        result = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+        try:
+            for partition in result.partitions():
+                yield from partition
+        finally:
+            result.close()
+
+
+SALES_JOINS = [
+    (DimRegion, FactSales.region_id == DimRegion.region_id),
+    (DimTime, FactSales.time_id == DimTime.time_id),
+]
+
+REGION_MONTH_FIELDS = {
+    'fact_id': FactSales.fact_id,
+    'region_id': FactSales.region_id,
+    'area_name': DimRegion.area_name,
+    'division': DimRegion.division,
+    'zone': DimRegion.zone,
+    'month': DimTime.month,
+    'year': DimTime.year,
+    'month_name': DimTime.month_name,
+}
+
+SALES_LISTING = FactListing(FactSales, SALES_JOINS, REGION_MONTH_FIELDS, {
+    'sales_target': FactSales.sales_target,
+    'gross_sales': FactSales.gross_sales,
+    'sales_return': FactSales.sales_return,
+    'net_sales': FactSales.net_sales,
+    'sales_ach_pct': FactSales.sales_achievement_pct,
+    'return_rate_pct': FactSales.return_rate_pct,
+})
+
+COLLECTION_LISTING = FactListing(FactSales, SALES_JOINS, REGION_MONTH_FIELDS, {
+    'coll_target': FactSales.coll_target,
+    'total_coll': FactSales.total_collection,
+    'coll_ach_pct': FactSales.coll_achievement_pct,
+    'cash_coll': FactSales.cash_collection,
+    'credit_coll': FactSales.credit_collection,
+    'seed_coll': FactSales.seed_collection,
+    'outstanding': FactSales.outstanding,
+})
+
+PRODUCT_SALES_LISTING = FactListing(FactProductPerformance, [
+    (DimProduct, FactProductPerformance.product_id == DimProduct.product_id),
+    (DimTime, FactProductPerformance.time_id == DimTime.time_id),
+], {
+    'fact_id': FactProductPerformance.fact_id,
+    'product_id': FactProductPerformance.product_id,
+    'product_name': DimProduct.product_name,
+    'product_category': DimProduct.product_category,
+    'month': DimTime.month,
+    'year': DimTime.year,
+    'month_name': DimTime.month_name,
+}, {
+    'sales_value': FactProductPerformance.sales_value,
+    'sales_volume': FactProductPerformance.sales_volume,
+    'prev_year_value': FactProductPerformance.prev_year_value,
+    'prev_year_volume': FactProductPerformance.prev_year_volume,
+    'value_growth_pct': FactProductPerformance.value_growth_pct,
+    'volume_growth_pct': FactProductPerformance.volume_growth_pct,
+})
+
+# Listings by the dataset name used in export URLs
+FACT_LISTINGS = {
+    'sales': SALES_LISTING,
+    'collections': COLLECTION_LISTING,
+    'product-sales': PRODUCT_SALES_LISTING,
+}
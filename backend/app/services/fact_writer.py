@@ -0,0 +1,196 @@
+"""
+Bulk writer for fact tables
+===========================
+
+Streams fact rows (plain dicts keyed by column name) into fact_sales and
+fact_product_performance in batches instead of adding one ORM object per row.
+
+Write modes:
+- orm:         legacy behaviour, one ORM object per row flushed at commit
+- executemany: Core INSERT with a list of parameter sets (multi-row VALUES)
+- copy:        PostgreSQL COPY FROM STDIN (falls back to executemany elsewhere)
+- auto:        copy on PostgreSQL, executemany on any other database
+- upsert:      keep existing rows of the period and only write the difference
+               (FactUpserter): INSERT ... ON CONFLICT DO UPDATE for new and
+               changed rows, DELETE for rows missing from the upload
+"""
+
+import csv
+from io import StringIO
+from itertools import islice
+from typing import Iterable, Iterator, List, Dict, Any, Sequence, Tuple
+from sqlalchemy import insert, select, delete, or_, func, Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+WRITE_MODES = ['auto', 'orm', 'executemany', 'copy', 'upsert']
+DEFAULT_WRITE_MODE = 'auto'
+BATCH_SIZE = 5000
+
+
+def is_postgresql(db: Session) -> bool:
+    """Check whether the session is bound to a PostgreSQL database"""
+    return db.get_bind().dialect.name == 'postgresql'
+
+
+def resolve_write_mode(db: Session, write_mode: str) -> str:
+    """Map a requested write mode to the one usable on the current database"""
+    if write_mode not in WRITE_MODES:
+        raise ValueError(f"Unknown write mode: {write_mode}. Use one of {', '.join(WRITE_MODES)}")
+    
+    if write_mode == 'auto':
+        return 'copy' if is_postgresql(db) else 'executemany'
+    if write_mode == 'copy' and not is_postgresql(db):
+        return 'executemany'
+    return write_mode
+
+
+def iter_batches(rows: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Split an iterable of rows into lists of at most batch_size rows"""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def copy_rows(db: Session, table: Table, rows: List[Dict[str, Any]]) -> None:
+    """Load rows with COPY FROM STDIN inside the session's transaction"""
+    columns = list(rows[0].keys())
+    
+    # COPY bypasses parameter binding, so apply the column types' bind
+    # conversions (e.g. measures stored as minor units) here
+    dialect = db.get_bind().dialect
+    processors = [table.c[col].type.dialect_impl(dialect).bind_processor(dialect) for col in columns]
+    
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([process(row[col]) if process else row[col] for col, process in zip(columns, processors)])
+    buffer.seek(0)
+    
+    sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(sql, buffer)
+    finally:
+        cursor.close()
+
+
+def write_fact_rows(db: Session, model, rows: Iterable[Dict[str, Any]],
+                    write_mode: str = DEFAULT_WRITE_MODE, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Insert fact rows for the given model using the selected write mode.
+    Rows are consumed lazily in batches. Returns the number of rows written.
+    """
+    mode = resolve_write_mode(db, write_mode)
+    if mode == 'upsert':
+        raise ValueError("Upsert writes go through FactUpserter")
+    table = model.__table__
+    written = 0
+    
+    for batch in iter_batches(rows, batch_size):
+        if mode == 'orm':
+            db.add_all(model(**row) for row in batch)
+        elif mode == 'copy':
+            copy_rows(db, table, batch)
+        else:
+            db.execute(insert(table), batch)
+        written += len(batch)
+    
+    return written
+
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+class FactUpserter:
+    """
+    Writes one upload's fact rows against the rows already stored for its
+    periods, keyed by a unique constraint (e.g. region_id + time_id).
+    
+    Existing rows are loaded once. Each written row is classified as
+    inserted, updated or unchanged; only inserted and updated rows are sent
+    to the database, and the ON CONFLICT update is guarded so rows whose
+    measures did not change keep their updated_at. remove_missing() deletes
+    stored rows the upload did not contain.
+    """
+    
+    def __init__(self, db: Session, model, key_columns: Sequence[str], time_ids: Sequence[int]):
+        dialect = db.get_bind().dialect.name
+        if dialect not in UPSERT_DIALECTS:
+            raise ValueError(f"Upsert is not supported on {dialect}")
+        
+        self.db = db
+        self.model = model
+        self.table = model.__table__
+        self.key_columns = list(key_columns)
+        self.insert = UPSERT_DIALECTS[dialect]
+        self.counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+        self.seen = set()
+        self.existing = self._load_existing(time_ids)
+        # Measures are compared as they would read back (rounded to their storage)
+        self.stored_values = {col.name: col.type.stored_value for col in self.table.columns
+                              if hasattr(col.type, 'stored_value')}
+    
+    def _key(self, row: Dict[str, Any]) -> Tuple:
+        return tuple(row[col] for col in self.key_columns)
+    
+    def _stored_value(self, col: str, value: Any) -> Any:
+        stored_value = self.stored_values.get(col)
+        return stored_value(value) if stored_value else value
+    
+    def _load_existing(self, time_ids: Sequence[int]) -> Dict[Tuple, Dict[str, Any]]:
+        """Stored rows of the periods, keyed by the unique key"""
+        result = self.db.execute(select(self.table).where(self.table.c.time_id.in_(list(time_ids))))
+        return {self._key(row): dict(row) for row in result.mappings()}
+    
+    def write(self, rows: Iterable[Dict[str, Any]], batch_size: int = BATCH_SIZE) -> int:
+        """Insert new rows and update changed ones, returning the number of inserted rows"""
+        inserted_before = self.counts['inserted']
+        for batch in iter_batches(rows, batch_size):
+            changed = []
+            for row in batch:
+                key = self._key(row)
+                if key in self.seen:
+                    raise ValueError(f"Duplicate {self.table.name} row for {dict(zip(self.key_columns, key))}")
+                self.seen.add(key)
+                
+                stored = self.existing.get(key)
+                if stored is None:
+                    self.counts['inserted'] += 1
+                    changed.append(row)
+                elif any(stored[col] != self._stored_value(col, value) for col, value in row.items()):
+                    self.counts['updated'] += 1
+                    changed.append(row)
+                else:
+                    self.counts['unchanged'] += 1
+            
+            if changed:
+                self._upsert(changed)
+        
+        return self.counts['inserted'] - inserted_before
+    
+    def _upsert(self, rows: List[Dict[str, Any]]) -> None:
+        stmt = self.insert(self.table)
+        measures = [col for col in rows[0] if col not in self.key_columns]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=self.key_columns,
+            set_={**{col: stmt.excluded[col] for col in measures}, 'updated_at': func.now()},
+            where=or_(*(self.table.c[col].is_distinct_from(stmt.excluded[col]) for col in measures))
+        )
+        self.db.execute(stmt, rows)
+    
+    def remove_missing(self) -> int:
+        """Delete stored rows of the periods that were not written in this upload"""
+        missing = [stored['fact_id'] for key, stored in self.existing.items() if key not in self.seen]
+        for batch in iter_batches(missing, BATCH_SIZE):
+            self.db.execute(delete(self.table).where(self.table.c.fact_id.in_(batch)))
+        self.counts['removed'] += len(missing)
+        return len(missing)
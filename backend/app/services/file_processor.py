@@ -5,11 +5,24 @@ from datetime import date
 from io import BytesIO
 from sqlalchemy.orm import Session
 from sqlalchemy import text, delete
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, Callable, List, Optional
 from app.models_star_schema import (
     DimTime, DimRegion, DimProduct, FactSales, FactProductPerformance,
-    get_month_name, get_month_short, get_quarter, get_fiscal_year
+    get_month_name
 )
+from app.services.fact_writer import write_fact_rows, FactUpserter, DEFAULT_WRITE_MODE
+from app.services.dimension_cache import dimension_cache
+from app.services.result_cache import result_cache
+from app.services.data_versions import bump_versions, upload_tables
+from app.services.sales_aggregates import refresh_sales_aggregates
+from app.services.workbook_loader import load_workbook_data, open_workbook, read_header_rows, STREAM_CHUNK_SIZE
+from app.services.upload_ledger import (
+    content_hash, find_duplicate, record_upload, duplicate_result, duplicate_message
+)
+
+
+# Called with (rows_parsed, rows_inserted) while an upload is processed
+ProgressCallback = Callable[[int, int], None]
 
 
 # Month name to number mapping
@@ -101,100 +114,126 @@ def extract_month_year_from_filename(filename: str) -> Tuple[Optional[int], Opti
     return month, year
 
 
+def extract_month_year_from_rows(rows) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Extract month and year from Excel header rows.
+    Looks for patterns like "November 2025" or "Nov-2025" in any cell.
+    """
+    for row in rows:
+        for cell in row:
+            if pd.notna(cell):
+                cell_str = str(cell).lower()
+                
+                # Try to find year
+                year_match = re.search(r'(20\d{2})', cell_str)
+                year = int(year_match.group(1)) if year_match else None
+                
+                # Try to find month
+                month = None
+                for month_name, month_num in MONTH_MAP.items():
+                    if month_name in cell_str:
+                        month = month_num
+                        break
+                
+                if month and year:
+                    return month, year
+    
+    return None, None
+
+
 def extract_month_year_from_excel(file_content, sheet_name=0) -> Tuple[Optional[int], Optional[int]]:
     """
     Extract month and year from Excel file header rows.
     Looks for patterns like "November 2025" or "Nov-2025" in first few rows.
     """
     try:
-        df_header = pd.read_excel(file_content, sheet_name=sheet_name, nrows=5, header=None)
-        file_content.seek(0)  # Reset file pointer
-        
-        for row in df_header.values:
-            for cell in row:
-                if pd.notna(cell):
-                    cell_str = str(cell).lower()
-                    
-                    # Try to find year
-                    year_match = re.search(r'(20\d{2})', cell_str)
-                    year = int(year_match.group(1)) if year_match else None
-                    
-                    # Try to find month
-                    month = None
-                    for month_name, month_num in MONTH_MAP.items():
-                        if month_name in cell_str:
-                            month = month_num
-                            break
-                    
-                    if month and year:
-                        return month, year
+        workbook = load_workbook_data(file_content, [sheet_name])
+        return extract_month_year_from_rows(workbook.header_rows(sheet_name))
     except:
-        pass
+        return None, None
+
+
+def resolve_period(filename: str, header_rows, override_month: int = None,
+                   override_year: int = None) -> Tuple[int, int]:
+    """
+    Resolve the upload period: filename first, then the sheet header rows,
+    then explicit overrides, defaulting to the current month/year.
+    """
+    month, year = extract_month_year_from_filename(filename)
     
-    return None, None
+    if month is None or year is None:
+        excel_month, excel_year = extract_month_year_from_rows(header_rows)
+        month = month or excel_month
+        year = year or excel_year
+    
+    # Apply overrides if provided
+    if override_month:
+        month = override_month
+    if override_year:
+        year = override_year
+    
+    # Default to current month/year if still not found
+    if month is None:
+        month = date.today().month
+    if year is None:
+        year = date.today().year
+    
+    return month, year
 
 
 def get_or_create_time(db: Session, month: int, year: int) -> DimTime:
     """Get or create time dimension record"""
-    time_dim = db.query(DimTime).filter(
-        DimTime.month == month,
-        DimTime.year == year
-    ).first()
-    
-    if not time_dim:
-        current_date = date.today()
-        time_dim = DimTime(
-            date=date(year, month, 1),
-            day=1,
-            month=month,
-            month_name=get_month_name(month),
-            month_short=get_month_short(month),
-            quarter=get_quarter(month),
-            quarter_name=f"Q{get_quarter(month)}",
-            year=year,
-            fiscal_year=get_fiscal_year(month, year),
-            is_current_month=1 if (month == current_date.month and year == current_date.year) else 0,
-            is_current_year=1 if year == current_date.year else 0
-        )
-        db.add(time_dim)
-        db.flush()
-    
-    return time_dim
+    return db.get(DimTime, dimension_cache.resolve_time(db, month, year))
+
+
+def region_dimension_row(area_code: str, area_name: str, division: str) -> dict:
+    """Column values for a new dim_region row"""
+    return {
+        'area_code': area_code,
+        'area_name': area_name,
+        'division': division,
+        'zone': get_zone(division),
+        'region_type': 'Area',
+        'is_active': 1
+    }
 
 
 def get_or_create_region(db: Session, area_code: str, area_name: str, division: str) -> DimRegion:
     """Get or create region dimension record"""
-    region = db.query(DimRegion).filter(DimRegion.area_name == area_name).first()
-    
-    if not region:
-        region = DimRegion(
-            area_code=area_code,
-            area_name=area_name,
-            division=division,
-            zone=get_zone(division),
-            region_type='Area',
-            is_active=1
-        )
-        db.add(region)
-        db.flush()
-    
-    return region
+    region_ids = dimension_cache.resolve_regions(db, [region_dimension_row(area_code, area_name, division)])
+    return db.get(DimRegion, region_ids[area_name])
 
 
 def get_or_create_product(db: Session, product_name: str, category: str = None) -> DimProduct:
     """Get or create product dimension record"""
-    product = db.query(DimProduct).filter(DimProduct.product_name == product_name).first()
-    
-    if not product:
-        product = DimProduct(
-            product_name=product_name,
-            product_category=category or 'General',
-            is_active=1
-        )
-        db.add(product)
-        db.flush()
-    
-    return product
+    product_ids = dimension_cache.resolve_products(db, [product_name], category)
+    return db.get(DimProduct, product_ids[product_name])
+
+
+def period_upserter(db: Session, model, key_columns: Tuple[str, str], time_ids: List[int],
+                    write_mode: str) -> Optional[FactUpserter]:
+    """FactUpserter for the upload's periods in upsert mode, None otherwise"""
+    return FactUpserter(db, model, key_columns, time_ids) if write_mode == 'upsert' else None
+
+
+def upsert_details(upserter: FactUpserter) -> Dict[str, Any]:
+    """Upload result counts of an upsert"""
+    return {
+        'deleted_records': upserter.remove_missing(),
+        'updated_records': upserter.counts['updated'],
+        'unchanged_records': upserter.counts['unchanged']
+    }
+
+
+def replace_message(records_processed: Dict[str, Any]) -> str:
+    """Message part describing what happened to the period's existing records"""
+    if 'updated_records' in records_processed:
+        return (f"Updated {records_processed['updated_records']} changed records, "
+                f"kept {records_processed['unchanged_records']} unchanged and "
+                f"removed {records_processed['deleted_records']} missing records. ")
+    if records_processed['deleted_records'] > 0:
+        return f"Replaced {records_processed['deleted_records']} existing records. "
+    return ""
 
 
 def delete_existing_sales_data(db: Session, time_id: int) -> int:
@@ -211,8 +250,197 @@ def delete_existing_product_data(db: Session, time_id: int) -> int:
     return deleted
 
 
+# Sales & Collection sheet layout: area codes and measure column positions
+SALES_AREA_CODES = ['A', 'B', 'C', 'D', 'E']
+
+SALES_MEASURE_COLUMNS = {
+    'sales_target': 2,
+    'gross_sales': 3,
+    'sales_return': 4,
+    'net_sales': 5,
+    'coll_target': 7,
+    'total_collection': 8,
+    'cash_collection': 11,
+    'credit_collection': 14,
+    'seed_collection': 17,
+}
+
+# Unique keys of the fact tables (see the upsert write mode)
+SALES_FACT_KEY = ('region_id', 'time_id')
+PRODUCT_FACT_KEY = ('product_id', 'time_id')
+
+# Measure columns of fact_sales, in table order
+FACT_SALES_MEASURES = [
+    'sales_target', 'gross_sales', 'sales_return', 'net_sales', 'sales_achievement_pct',
+    'coll_target', 'total_collection', 'cash_collection', 'credit_collection', 'seed_collection',
+    'coll_achievement_pct', 'outstanding', 'return_rate_pct'
+]
+
+
+def numeric_column(df: pd.DataFrame, position: int) -> np.ndarray:
+    """Coerce a whole column to float (NaN and missing columns become 0)"""
+    if position >= len(df.columns):
+        return np.zeros(len(df), dtype=float)
+    values = pd.to_numeric(df.iloc[:, position], errors='coerce')
+    return values.fillna(0).to_numpy(dtype=float)
+
+
+def text_column(df: pd.DataFrame, position: int) -> pd.Series:
+    """Column as stripped strings (NaN and missing columns become '')"""
+    if position >= len(df.columns):
+        return pd.Series('', index=df.index)
+    col = df.iloc[:, position]
+    return col.astype(str).str.strip().where(col.notna(), '')
+
+
+def percentage(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator * 100 rounded to 2 places, 0 where denominator <= 0"""
+    result = np.zeros(len(numerator), dtype=float)
+    positive = denominator > 0
+    np.divide(numerator * 100, denominator, out=result, where=positive)
+    return np.round(result, 2)
+
+
+def build_sales_records(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized parse of the Sales & Collection sheet.
+    
+    Keeps only area rows (area code A-E, non-total area name), coerces all
+    measure columns at once and derives achievement %, return rate and
+    outstanding as whole-column operations. Returns one row per area with
+    area_code, area_name, division and the FACT_SALES_MEASURES columns.
+    """
+    area_codes = text_column(df_raw, 0)
+    area_names = text_column(df_raw, 1)
+    
+    is_area = area_codes.isin(SALES_AREA_CODES) & (area_names != '') & \
+        ~area_names.str.lower().str.contains('total', regex=False)
+    df = df_raw[is_area.to_numpy()]
+    
+    records = pd.DataFrame({
+        'area_code': area_codes[is_area].to_numpy(),
+        'area_name': area_names[is_area].to_numpy(),
+    })
+    records['division'] = records['area_name'].map(DIVISIONS).fillna('Unknown')
+    
+    for measure, position in SALES_MEASURE_COLUMNS.items():
+        records[measure] = numeric_column(df, position)
+    
+    records['sales_achievement_pct'] = percentage(records['net_sales'].to_numpy(), records['sales_target'].to_numpy())
+    records['coll_achievement_pct'] = percentage(records['total_collection'].to_numpy(), records['coll_target'].to_numpy())
+    records['return_rate_pct'] = percentage(records['sales_return'].to_numpy(), records['gross_sales'].to_numpy())
+    records['outstanding'] = records['net_sales'] - records['total_collection']
+    
+    return records[['area_code', 'area_name', 'division'] + FACT_SALES_MEASURES]
+
+
+# Product comparison sheet names
+VALUE_SHEET = 'Monthly Value'
+VOLUME_SHEET = 'Monthly Volume'
+
+# Product comparison rows whose name contains any of these are headers/totals
+PRODUCT_EXCLUDE_KEYWORDS = ['Product Name', 'Surovi', 'Monthly', 'Period', 'Total', 'TOTAL', 'Grand', 'SL', 'No']
+
+
+def product_sheet_frame(df: pd.DataFrame, measure: str) -> pd.DataFrame:
+    """
+    Product name plus previous/current year measure from a comparison sheet
+    (columns B, C, D), indexed by the stripped name. The first row wins for
+    duplicate names.
+    """
+    frame = pd.DataFrame({
+        'product_name': text_column(df, 1).to_numpy(),
+        f'{measure}_prev': numeric_column(df, 2),
+        f'{measure}_curr': numeric_column(df, 3),
+    })
+    frame = frame[frame['product_name'] != '']
+    return frame.drop_duplicates('product_name', keep='first').set_index('product_name')
+
+
+def build_product_records(df_value: pd.DataFrame, df_volume: pd.DataFrame) -> pd.DataFrame:
+    """
+    Join the Monthly Value and Monthly Volume sheets on product name.
+    
+    Drops header/total rows (PRODUCT_EXCLUDE_KEYWORDS) and names shorter than
+    2 characters, then computes value/volume growth and growth % as column
+    operations. Products missing from the volume sheet get zero volume.
+    """
+    return join_product_records(product_sheet_frame(df_value, 'value'), product_sheet_frame(df_volume, 'volume'))
+
+
+def join_product_records(values: pd.DataFrame, volumes: pd.DataFrame) -> pd.DataFrame:
+    """Filter and join product_sheet_frame() outputs, adding growth columns"""
+    names = values.index.to_series()
+    exclude_pattern = '|'.join(re.escape(k.lower()) for k in PRODUCT_EXCLUDE_KEYWORDS)
+    keep = ~names.str.lower().str.contains(exclude_pattern) & (names.str.len() >= 2)
+    
+    records = values[keep.to_numpy()].join(volumes, how='left').fillna(0)
+    records['value_growth'] = records['value_curr'] - records['value_prev']
+    records['volume_growth'] = records['volume_curr'] - records['volume_prev']
+    records['value_growth_pct'] = percentage(records['value_growth'].to_numpy(), records['value_prev'].to_numpy())
+    records['volume_growth_pct'] = percentage(records['volume_growth'].to_numpy(), records['volume_prev'].to_numpy())
+    
+    return records.reset_index()
+
+
+def sales_fact_rows(db: Session, sales_records: pd.DataFrame, time_id: int) -> List[Dict[str, Any]]:
+    """fact_sales rows for parsed area records, resolving regions in one batch"""
+    records = sales_records.to_dict('records')
+    region_ids = dimension_cache.resolve_regions(db, (
+        region_dimension_row(r['area_code'], r['area_name'], r['division']) for r in records
+    ))
+    return [{
+        'region_id': region_ids[record['area_name']],
+        'time_id': time_id,
+        **{col: record[col] for col in FACT_SALES_MEASURES}
+    } for record in records]
+
+
+def product_fact_rows(db: Session, product_records: pd.DataFrame,
+                      time_prev_id: int, time_curr_id: int) -> List[Dict[str, Any]]:
+    """
+    fact_product_performance rows for joined product records: a previous year
+    fact and a current year fact with YoY comparison for every product.
+    """
+    # Resolve all product dimensions in one batch
+    product_ids = dimension_cache.resolve_products(db, product_records['product_name'].tolist())
+    product_id_col = product_records['product_name'].map(product_ids).to_numpy()
+    zeros = np.zeros(len(product_records))
+    
+    prev_facts = pd.DataFrame({
+        'product_id': product_id_col,
+        'time_id': time_prev_id,
+        'sales_value': product_records['value_prev'].to_numpy(),
+        'sales_volume': product_records['volume_prev'].to_numpy(),
+        'prev_year_value': zeros,
+        'prev_year_volume': zeros,
+        'value_growth': zeros,
+        'volume_growth': zeros,
+        'value_growth_pct': zeros,
+        'volume_growth_pct': zeros
+    })
+    curr_facts = pd.DataFrame({
+        'product_id': product_id_col,
+        'time_id': time_curr_id,
+        'sales_value': product_records['value_curr'].to_numpy(),
+        'sales_volume': product_records['volume_curr'].to_numpy(),
+        'prev_year_value': product_records['value_prev'].to_numpy(),
+        'prev_year_volume': product_records['volume_prev'].to_numpy(),
+        'value_growth': product_records['value_growth'].to_numpy(),
+        'volume_growth': product_records['volume_growth'].to_numpy(),
+        'value_growth_pct': product_records['value_growth_pct'].to_numpy(),
+        'volume_growth_pct': product_records['volume_growth_pct'].to_numpy()
+    })
+    
+    # Keep the prev/curr pair of each product adjacent
+    return pd.concat([prev_facts, curr_facts]).sort_index(kind='stable').to_dict('records')
+
+
 def process_sales_collection_file(file_content, filename: str, db: Session, 
-                                   override_month: int = None, override_year: int = None) -> Tuple[bool, str, Dict[str, Any]]:
+                                   override_month: int = None, override_year: int = None,
+                                   write_mode: str = DEFAULT_WRITE_MODE, streaming: bool = False,
+                                   chunk_size: int = STREAM_CHUNK_SIZE,
+                                   progress_callback: Optional[ProgressCallback] = None) -> Tuple[bool, str, Dict[str, Any]]:
     """
     Process Sales & Collection Excel file into star schema.
     
@@ -234,123 +462,86 @@ def process_sales_collection_file(file_content, filename: str, db: Session,
         O: Credit Collection
         P-Q: (details)
         R: Seed Collection
+    
+    write_mode selects how fact rows are inserted (see app.services.fact_writer).
+    progress_callback, if given, is called with (rows_parsed, rows_inserted)
+    after every chunk. With streaming=True the sheet is read in chunks of chunk_size rows and
+    each chunk is written before the next is parsed.
     """
     try:
-        # Extract month/year from filename first, then from Excel content
-        month, year = extract_month_year_from_filename(filename)
-        
-        if month is None or year is None:
-            file_content.seek(0)
-            excel_month, excel_year = extract_month_year_from_excel(file_content)
-            month = month or excel_month
-            year = year or excel_year
-        
-        # Apply overrides if provided
-        if override_month:
-            month = override_month
-        if override_year:
-            year = override_year
-        
-        # Default to current month/year if still not found
-        if month is None:
-            month = date.today().month
-        if year is None:
-            year = date.today().year
-        
-        # Get or create time dimension
-        time_dim = get_or_create_time(db, month, year)
-        
-        # DELETE existing data for this month/year FIRST
-        deleted_count = delete_existing_sales_data(db, time_dim.time_id)
-        
-        records_processed = {
-            'month': month,
-            'year': year,
-            'month_name': get_month_name(month),
-            'deleted_records': deleted_count,
-            'regions_processed': 0,
-            'fact_sales_inserted': 0
-        }
-        
-        # Read the Excel file
-        file_content.seek(0)
-        df_raw = pd.read_excel(file_content, sheet_name=0, skiprows=4, header=None)
-        
-        for idx, row in df_raw.iterrows():
-            area_code = str(row.iloc[0]).strip() if pd.notna(row.iloc[0]) else ''
-            
-            if area_code in ['A', 'B', 'C', 'D', 'E']:
-                area_name = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else ''
-                
-                if area_name and 'Total' not in area_name and 'total' not in area_name.lower():
-                    division = DIVISIONS.get(area_name, 'Unknown')
-                    
-                    # Get or create region dimension
-                    region = get_or_create_region(db, area_code, area_name, division)
-                    records_processed['regions_processed'] += 1
-                    
-                    # Parse sales data (handle NaN as 0)
-                    def safe_numeric(val):
-                        try:
-                            num = pd.to_numeric(val, errors='coerce')
-                            return 0 if pd.isna(num) else float(num)
-                        except:
-                            return 0
-                    
-                    sales_target = safe_numeric(row.iloc[2])
-                    gross_sales = safe_numeric(row.iloc[3])
-                    sales_return = safe_numeric(row.iloc[4])
-                    net_sales = safe_numeric(row.iloc[5])
-                    
-                    # Parse collection data
-                    coll_target = safe_numeric(row.iloc[7]) if len(row) > 7 else 0
-                    total_coll = safe_numeric(row.iloc[8]) if len(row) > 8 else 0
-                    cash_coll = safe_numeric(row.iloc[11]) if len(row) > 11 else 0
-                    credit_coll = safe_numeric(row.iloc[14]) if len(row) > 14 else 0
-                    seed_coll = safe_numeric(row.iloc[17]) if len(row) > 17 else 0
-                    
-                    # Calculate metrics
-                    sales_ach_pct = round((net_sales / sales_target * 100), 2) if sales_target > 0 else 0
-                    coll_ach_pct = round((total_coll / coll_target * 100), 2) if coll_target > 0 else 0
-                    return_rate = round((sales_return / gross_sales * 100), 2) if gross_sales > 0 else 0
-                    outstanding = net_sales - total_coll
-                    
-                    # Insert new fact record
-                    db.add(FactSales(
-                        region_id=region.region_id,
-                        time_id=time_dim.time_id,
-                        sales_target=sales_target,
-                        gross_sales=gross_sales,
-                        sales_return=sales_return,
-                        net_sales=net_sales,
-                        sales_achievement_pct=sales_ach_pct,
-                        coll_target=coll_target,
-                        total_collection=total_coll,
-                        cash_collection=cash_coll,
-                        credit_collection=credit_coll,
-                        seed_collection=seed_coll,
-                        coll_achievement_pct=coll_ach_pct,
-                        outstanding=outstanding,
-                        return_rate_pct=return_rate
-                    ))
-                    records_processed['fact_sales_inserted'] += 1
-        
-        db.commit()
-        
-        message = f"Sales & Collection data for {get_month_name(month)} {year} processed successfully. "
-        if deleted_count > 0:
-            message += f"Replaced {deleted_count} existing records. "
-        message += f"Inserted {records_processed['fact_sales_inserted']} new records."
-        
-        return True, message, records_processed
-        
+        with open_workbook(file_content, [0], streaming) as workbook:
+            return _load_sales_collection(workbook, filename, db, override_month, override_year,
+                                          write_mode, chunk_size, progress_callback)
     except Exception as e:
         db.rollback()
         return False, f"Error processing file: {str(e)}", {}
 
 
+def _load_sales_collection(workbook, filename: str, db: Session, override_month: int, override_year: int,
+                           write_mode: str, chunk_size: int,
+                           progress_callback: Optional[ProgressCallback]) -> Tuple[bool, str, Dict[str, Any]]:
+    """Write the Sales & Collection facts of an opened workbook and commit"""
+    # Month/year from filename first, then from Excel content
+    month, year = resolve_period(filename, workbook.header_rows(0), override_month, override_year)
+    
+    # Load dimension keys once for the whole upload
+    dimension_cache.preload(db)
+    time_id = dimension_cache.resolve_time(db, month, year)
+    
+    # DELETE existing data for this month/year FIRST (upsert mode diffs against it instead)
+    upserter = period_upserter(db, FactSales, SALES_FACT_KEY, [time_id], write_mode)
+    deleted_count = 0 if upserter else delete_existing_sales_data(db, time_id)
+    
+    records_processed = {
+        'month': month,
+        'year': year,
+        'month_name': get_month_name(month),
+        'deleted_records': deleted_count,
+        'regions_processed': 0,
+        'fact_sales_inserted': 0
+    }
+    
+    # Build each fact batch column-wise, then resolve regions in one batch
+    rows_parsed = 0
+    for df_raw in workbook.iter_frames(0, skiprows=4, header=None, chunk_size=chunk_size):
+        sales_records = build_sales_records(df_raw)
+        records_processed['regions_processed'] += len(sales_records)
+        
+        fact_rows = sales_fact_rows(db, sales_records, time_id)
+        if upserter:
+            records_processed['fact_sales_inserted'] += upserter.write(fact_rows)
+        else:
+            records_processed['fact_sales_inserted'] += write_fact_rows(db, FactSales, fact_rows, write_mode)
+        
+        rows_parsed += len(df_raw)
+        if progress_callback:
+            progress_callback(rows_parsed, records_processed['fact_sales_inserted'])
+    
+    if upserter:
+        records_processed.update(upsert_details(upserter))
+    
+    refresh_sales_aggregates(db, [time_id])
+    changed_dimensions = dimension_cache.changed_tables(db)
+    bump_versions(db, upload_tables('fact_sales', changed_dimensions))
+    db.commit()
+    result_cache.invalidate_periods([(month, year)], dimensions=bool(changed_dimensions))
+    
+    return True, sales_upload_message(records_processed), records_processed
+
+
+def sales_upload_message(records_processed: Dict[str, Any]) -> str:
+    """Result message for a processed Sales & Collection upload"""
+    message = f"Sales & Collection data for {records_processed['month_name']} {records_processed['year']} processed successfully. "
+    message += replace_message(records_processed)
+    message += f"Inserted {records_processed['fact_sales_inserted']} new records."
+    return message
+
+
 def process_product_comparison_file(file_content, filename: str, db: Session,
-                                     override_month: int = None, override_year: int = None) -> Tuple[bool, str, Dict[str, Any]]:
+                                     override_month: int = None, override_year: int = None,
+                                     write_mode: str = DEFAULT_WRITE_MODE, streaming: bool = False,
+                                     chunk_size: int = STREAM_CHUNK_SIZE,
+                                     progress_callback: Optional[ProgressCallback] = None) -> Tuple[bool, str, Dict[str, Any]]:
     """
     Process Product Sales Comparison Excel file into star schema.
     
@@ -365,165 +556,178 @@ def process_product_comparison_file(file_content, filename: str, db: Session,
         D: Current Year Value/Volume
         E: (optional)
         F: Growth %
+    
+    write_mode selects how fact rows are inserted (see app.services.fact_writer).
+    progress_callback, if given, is called with (rows_parsed, rows_inserted)
+    after every chunk. With streaming=True the Monthly Value sheet is read in chunks of chunk_size
+    rows; only the compact per-product volume index is held in memory.
     """
     try:
-        # Extract month/year
-        month, year = extract_month_year_from_filename(filename)
-        
-        if month is None or year is None:
-            file_content.seek(0)
-            excel_month, excel_year = extract_month_year_from_excel(file_content, 'Monthly Value')
-            month = month or excel_month
-            year = year or excel_year
-        
-        # Apply overrides
-        if override_month:
-            month = override_month
-        if override_year:
-            year = override_year
-        
-        # Default
-        if month is None:
-            month = date.today().month
-        if year is None:
-            year = date.today().year
-        
-        prev_year = year - 1
-        
-        # Get or create time dimensions
-        time_prev = get_or_create_time(db, month, prev_year)
-        time_curr = get_or_create_time(db, month, year)
-        
-        # DELETE existing data for both years
-        deleted_prev = delete_existing_product_data(db, time_prev.time_id)
-        deleted_curr = delete_existing_product_data(db, time_curr.time_id)
-        
-        records_processed = {
-            'month': month,
-            'year': year,
-            'month_name': get_month_name(month),
-            'deleted_records': deleted_prev + deleted_curr,
-            'products_processed': 0,
-            'fact_records_inserted': 0
-        }
-        
-        # Read Value sheet
-        file_content.seek(0)
-        try:
-            df_value = pd.read_excel(file_content, sheet_name='Monthly Value', skiprows=4)
-        except:
-            file_content.seek(0)
-            df_value = pd.read_excel(file_content, sheet_name=0, skiprows=4)
-        
-        df_value = df_value.dropna(how='all')
-        
-        # Assign column names based on available columns
-        num_cols = len(df_value.columns)
-        if num_cols >= 6:
-            df_value.columns = ['Index', 'Product_Name', 'Value_Prev', 'Value_Curr', 'Extra', 'Growth'][:num_cols]
-        elif num_cols >= 4:
-            df_value.columns = ['Index', 'Product_Name', 'Value_Prev', 'Value_Curr'][:num_cols]
-        
-        # Read Volume sheet
-        file_content.seek(0)
-        try:
-            df_volume = pd.read_excel(file_content, sheet_name='Monthly Volume', skiprows=4)
-            df_volume = df_volume.dropna(how='all')
-            if len(df_volume.columns) >= 6:
-                df_volume.columns = ['Index', 'Product_Name', 'Volume_Prev', 'Volume_Curr', 'Extra', 'Growth'][:len(df_volume.columns)]
-            elif len(df_volume.columns) >= 4:
-                df_volume.columns = ['Index', 'Product_Name', 'Volume_Prev', 'Volume_Curr'][:len(df_volume.columns)]
-        except:
-            df_volume = pd.DataFrame()
-        
-        # Process products
-        products = df_value['Product_Name'].dropna().unique()
-        exclude_keywords = ['Product Name', 'Surovi', 'Monthly', 'Period', 'Total', 'TOTAL', 'Grand', 'SL', 'No']
-        products = [p for p in products if not any(x.lower() in str(p).lower() for x in exclude_keywords)]
-        
-        def safe_numeric(val):
-            try:
-                num = pd.to_numeric(val, errors='coerce')
-                return 0 if pd.isna(num) else float(num)
-            except:
-                return 0
-        
-        for product_name in products:
-            product_name = str(product_name).strip()
-            if not product_name or len(product_name) < 2:
-                continue
-                
-            # Get or create product dimension
-            product = get_or_create_product(db, product_name)
-            records_processed['products_processed'] += 1
-            
-            # Get value data
-            value_row = df_value[df_value['Product_Name'] == product_name]
-            
-            val_prev = 0
-            val_curr = 0
-            vol_prev = 0
-            vol_curr = 0
-            
-            if not value_row.empty:
-                val_prev = safe_numeric(value_row['Value_Prev'].values[0]) if 'Value_Prev' in value_row.columns else 0
-                val_curr = safe_numeric(value_row['Value_Curr'].values[0]) if 'Value_Curr' in value_row.columns else 0
-            
-            # Get volume data if available
-            if not df_volume.empty:
-                volume_row = df_volume[df_volume['Product_Name'] == product_name]
-                if not volume_row.empty:
-                    vol_prev = safe_numeric(volume_row['Volume_Prev'].values[0]) if 'Volume_Prev' in volume_row.columns else 0
-                    vol_curr = safe_numeric(volume_row['Volume_Curr'].values[0]) if 'Volume_Curr' in volume_row.columns else 0
-            
-            # Calculate growth
-            value_growth = val_curr - val_prev
-            volume_growth = vol_curr - vol_prev
-            value_growth_pct = round((value_growth / val_prev * 100), 2) if val_prev > 0 else 0
-            volume_growth_pct = round((volume_growth / vol_prev * 100), 2) if vol_prev > 0 else 0
-            
-            # Insert previous year fact
-            db.add(FactProductPerformance(
-                product_id=product.product_id,
-                time_id=time_prev.time_id,
-                sales_value=val_prev,
-                sales_volume=vol_prev,
-                prev_year_value=0,
-                prev_year_volume=0,
-                value_growth=0,
-                volume_growth=0,
-                value_growth_pct=0,
-                volume_growth_pct=0
-            ))
-            records_processed['fact_records_inserted'] += 1
-            
-            # Insert current year fact with YoY comparison
-            db.add(FactProductPerformance(
-                product_id=product.product_id,
-                time_id=time_curr.time_id,
-                sales_value=val_curr,
-                sales_volume=vol_curr,
-                prev_year_value=val_prev,
-                prev_year_volume=vol_prev,
-                value_growth=value_growth,
-                volume_growth=volume_growth,
-                value_growth_pct=value_growth_pct,
-                volume_growth_pct=volume_growth_pct
-            ))
-            records_processed['fact_records_inserted'] += 1
-        
-        db.commit()
-        
-        message = f"Product comparison data for {get_month_name(month)} {year} processed successfully. "
-        if records_processed['deleted_records'] > 0:
-            message += f"Replaced {records_processed['deleted_records']} existing records. "
-        message += f"Inserted {records_processed['fact_records_inserted']} new records for {records_processed['products_processed']} products."
-        
-        return True, message, records_processed
-        
+        with open_workbook(file_content, [VALUE_SHEET, 0, VOLUME_SHEET], streaming) as workbook:
+            return _load_product_comparison(workbook, filename, db, override_month, override_year,
+                                            write_mode, chunk_size, progress_callback)
+    except Exception as e:
+        db.rollback()
+        return False, f"Error processing file: {str(e)}", {}
+
+
+def _load_product_comparison(workbook, filename: str, db: Session, override_month: int, override_year: int,
+                             write_mode: str, chunk_size: int,
+                             progress_callback: Optional[ProgressCallback]) -> Tuple[bool, str, Dict[str, Any]]:
+    """Write the product comparison facts of an opened workbook and commit"""
+    value_sheet = VALUE_SHEET if workbook.has_sheet(VALUE_SHEET) else 0
+    
+    # Extract month/year
+    header_rows = workbook.header_rows(VALUE_SHEET) if workbook.has_sheet(VALUE_SHEET) else []
+    month, year = resolve_period(filename, header_rows, override_month, override_year)
+    
+    prev_year = year - 1
+    
+    # Load dimension keys once for the whole upload
+    dimension_cache.preload(db)
+    time_prev_id = dimension_cache.resolve_time(db, month, prev_year)
+    time_curr_id = dimension_cache.resolve_time(db, month, year)
+    
+    # DELETE existing data for both years (upsert mode diffs against it instead)
+    upserter = period_upserter(db, FactProductPerformance, PRODUCT_FACT_KEY, [time_prev_id, time_curr_id], write_mode)
+    if upserter:
+        deleted_count = 0
+    else:
+        deleted_count = delete_existing_product_data(db, time_prev_id) + delete_existing_product_data(db, time_curr_id)
+    
+    records_processed = {
+        'month': month,
+        'year': year,
+        'month_name': get_month_name(month),
+        'deleted_records': deleted_count,
+        'products_processed': 0,
+        'fact_records_inserted': 0
+    }
+    
+    # Compact per-product volume index (first row wins for duplicate names)
+    volume_frames = [
+        product_sheet_frame(df_volume, 'volume')
+        for df_volume in workbook.iter_frames(VOLUME_SHEET, skiprows=4, header=0, chunk_size=chunk_size)
+    ] if workbook.has_sheet(VOLUME_SHEET) else []
+    volumes = pd.concat(volume_frames) if volume_frames else product_sheet_frame(pd.DataFrame(), 'volume')
+    volumes = volumes[~volumes.index.duplicated(keep='first')]
+    
+    # Join each chunk of the value sheet to the volume index on the normalized product name
+    seen_products = set()
+    rows_parsed = 0
+    for df_value in workbook.iter_frames(value_sheet, skiprows=4, header=0, chunk_size=chunk_size):
+        values = product_sheet_frame(df_value, 'value')
+        values = values[~values.index.isin(seen_products)]
+        seen_products.update(values.index)
+        
+        product_records = join_product_records(values, volumes)
+        records_processed['products_processed'] += len(product_records)
+        
+        fact_rows = product_fact_rows(db, product_records, time_prev_id, time_curr_id)
+        if upserter:
+            records_processed['fact_records_inserted'] += upserter.write(fact_rows)
+        else:
+            records_processed['fact_records_inserted'] += write_fact_rows(db, FactProductPerformance, fact_rows, write_mode)
+        
+        rows_parsed += len(df_value)
+        if progress_callback:
+            progress_callback(rows_parsed, records_processed['fact_records_inserted'])
+    
+    if upserter:
+        records_processed.update(upsert_details(upserter))
+    
+    changed_dimensions = dimension_cache.changed_tables(db)
+    bump_versions(db, upload_tables('fact_product_performance', changed_dimensions))
+    db.commit()
+    result_cache.invalidate_periods([(month, prev_year), (month, year)], dimensions=bool(changed_dimensions))
+    
+    return True, product_upload_message(records_processed), records_processed
+
+
+def product_upload_message(records_processed: Dict[str, Any]) -> str:
+    """Result message for a processed Product Comparison upload"""
+    message = f"Product comparison data for {records_processed['month_name']} {records_processed['year']} processed successfully. "
+    message += replace_message(records_processed)
+    message += f"Inserted {records_processed['fact_records_inserted']} new records for {records_processed['products_processed']} products."
+    return message
+
+
+def upload_period(file_content, filename: str, file_type: str,
+                  override_month: int = None, override_year: int = None) -> Tuple[int, int]:
+    """
+    Resolve an upload's period like the processors do, reading only the
+    header rows and only when the filename and overrides are not enough.
+    """
+    month, year = extract_month_year_from_filename(filename)
+    if (override_month or month) and (override_year or year):
+        return resolve_period(filename, [], override_month, override_year)
+    
+    sheet = VALUE_SHEET if file_type == 'product_comparison' else 0
+    return resolve_period(filename, read_header_rows(file_content, sheet), override_month, override_year)
+
+
+def process_upload(file_content, filename: str, file_type: str, db: Session,
+                   force: bool = False, **options) -> Tuple[bool, str, Dict[str, Any]]:
+    """
+    Run the processor for a detected file type (options are passed through).
+    
+    Every successful upload is recorded in the upload ledger. Unless force
+    is set, a file identical to the last one loaded for its period is
+    reported as a no-op without touching the facts.
+    """
+    if file_type not in ('sales_collection', 'product_comparison'):
+        return False, f"Unknown file type for {filename}", {}
+    
+    try:
+        digest = content_hash(file_content)
+        if not force:
+            month, year = upload_period(file_content, filename, file_type,
+                                        options.get('override_month'), options.get('override_year'))
+            duplicate = find_duplicate(db, digest, file_type, month, year)
+            if duplicate:
+                return True, duplicate_message(duplicate), duplicate_result(duplicate)
     except Exception as e:
         db.rollback()
         return False, f"Error processing file: {str(e)}", {}
+    
+    if file_type == 'sales_collection':
+        success, message, details = process_sales_collection_file(file_content, filename, db, **options)
+    else:
+        success, message, details = process_product_comparison_file(file_content, filename, db, **options)
+    
+    if success:
+        # Facts are already committed; a missing entry only costs a reprocess
+        try:
+            record_upload(db, digest, file_type, filename, details)
+            db.commit()
+        except Exception:
+            db.rollback()
+    return success, message, details
+
+
+def parse_upload(file_content, filename: str, file_type: str,
+                 override_month: int = None, override_year: int = None) -> Dict[str, Any]:
+    """
+    Parse a workbook into its period and records without touching the
+    database. Top-level and side-effect free so it can run in a worker
+    process; returns {'month', 'year', 'records'} where records is the
+    build_sales_records() or build_product_records() frame.
+    """
+    if file_type == 'sales_collection':
+        workbook = load_workbook_data(file_content, [0])
+        month, year = resolve_period(filename, workbook.header_rows(0), override_month, override_year)
+        records = build_sales_records(workbook.frame(0, skiprows=4))
+    elif file_type == 'product_comparison':
+        workbook = load_workbook_data(file_content, [VALUE_SHEET, 0, VOLUME_SHEET])
+        value_sheet = VALUE_SHEET if workbook.has_sheet(VALUE_SHEET) else 0
+        header_rows = workbook.header_rows(VALUE_SHEET) if workbook.has_sheet(VALUE_SHEET) else []
+        month, year = resolve_period(filename, header_rows, override_month, override_year)
+        df_volume = workbook.frame(VOLUME_SHEET, skiprows=4, header=0) if workbook.has_sheet(VOLUME_SHEET) else pd.DataFrame()
+        records = build_product_records(workbook.frame(value_sheet, skiprows=4, header=0), df_volume)
+    else:
+        raise ValueError(f"Unknown file type for {filename}")
+    
+    return {'month': month, 'year': year, 'records': records}
 
 
 def detect_file_type(filename: str) -> str:
@@ -0,0 +1,157 @@
+"""
+Report Exporter
+===============
+
+Excel reports of the fact tables for a range of months:
+- sales:              area-wise sales target / gross / return / net
+- collections:        area-wise collection target / cash / credit / seed
+- product-comparison: product value and volume against the previous year
+
+Workbooks are created with openpyxl in write-only mode and fed row by row
+from the streamed fact rows (FactListing.stream), so a report of hundreds
+of thousands of rows is written to disk without holding the sheet in
+memory.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+from app.services.fact_queries import FactListing, SALES_LISTING, COLLECTION_LISTING, PRODUCT_SALES_LISTING
+
+
+AMOUNT_FORMAT = '#,##0'
+PERCENT_FORMAT = '0.00'
+
+
+class ReportColumn(NamedTuple):
+    field: str
+    header: str
+    width: int = 15
+    number_format: Optional[str] = None
+
+
+class Report(NamedTuple):
+    title: str
+    sheet: str
+    listing: FactListing
+    columns: List[ReportColumn]
+
+    @property
+    def field_names(self) -> List[str]:
+        return [column.field for column in self.columns]
+
+
+PERIOD_COLUMNS = [
+    ReportColumn('year', "Year", 8),
+    ReportColumn('month_name', "Month", 12),
+]
+
+AREA_COLUMNS = PERIOD_COLUMNS + [
+    ReportColumn('zone', "Zone", 12),
+    ReportColumn('division', "Division", 15),
+    ReportColumn('area_name', "Area Name", 20),
+]
+
+PRODUCT_COLUMNS = PERIOD_COLUMNS + [
+    ReportColumn('product_name', "Product Name", 30),
+    ReportColumn('product_category', "Category", 15),
+    ReportColumn('sales_value', "Value", number_format=AMOUNT_FORMAT),
+    ReportColumn('prev_year_value', "Previous Year Value", 18, AMOUNT_FORMAT),
+    ReportColumn('value_growth_pct', "Value Growth %", 14, PERCENT_FORMAT),
+    ReportColumn('sales_volume', "Volume", number_format=AMOUNT_FORMAT),
+    ReportColumn('prev_year_volume', "Previous Year Volume", 18, AMOUNT_FORMAT),
+    ReportColumn('volume_growth_pct', "Volume Growth %", 14, PERCENT_FORMAT),
+]
+
+REPORTS: Dict[str, Report] = {
+    'sales': Report("Sales Report", "Sales", SALES_LISTING, AREA_COLUMNS + [
+        ReportColumn('sales_target', "Sales Target", number_format=AMOUNT_FORMAT),
+        ReportColumn('gross_sales', "Gross Sales", number_format=AMOUNT_FORMAT),
+        ReportColumn('sales_return', "Sales Return", number_format=AMOUNT_FORMAT),
+        ReportColumn('net_sales', "Net Sales", number_format=AMOUNT_FORMAT),
+        ReportColumn('sales_ach_pct', "Achievement %", 13, PERCENT_FORMAT),
+        ReportColumn('return_rate_pct', "Return Rate %", 13, PERCENT_FORMAT),
+    ]),
+    'collections': Report("Collection Report", "Collections", COLLECTION_LISTING, AREA_COLUMNS + [
+        ReportColumn('coll_target', "Collection Target", number_format=AMOUNT_FORMAT),
+        ReportColumn('total_coll', "Total Collection", number_format=AMOUNT_FORMAT),
+        ReportColumn('coll_ach_pct', "Achievement %", 13, PERCENT_FORMAT),
+        ReportColumn('cash_coll', "Cash Collection", number_format=AMOUNT_FORMAT),
+        ReportColumn('credit_coll', "Credit Collection", number_format=AMOUNT_FORMAT),
+        ReportColumn('seed_coll', "Seed Collection", number_format=AMOUNT_FORMAT),
+        ReportColumn('outstanding', "Outstanding", number_format=AMOUNT_FORMAT),
+    ]),
+    'product-comparison': Report("Product Comparison Report", "Product Comparison", PRODUCT_SALES_LISTING,
+                                 PRODUCT_COLUMNS),
+}
+
+
+def period_label(period: Tuple[int, int]) -> str:
+    """'Nov 2025' for (11, 2025)"""
+    month, year = period
+    return date(year, month, 1).strftime('%b %Y')
+
+
+def write_report(report: Report, records: Iterable[Dict], path: str,
+                 start: Optional[Tuple[int, int]] = None, end: Optional[Tuple[int, int]] = None) -> int:
+    """
+    Write the records of a report to an .xlsx file at path. start / end are
+    the (month, year) bounds shown in the title. Returns the number of rows.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(report.sheet)
+    
+    # Column widths must be set before the first row is written
+    for index, column in enumerate(report.columns, 1):
+        ws.column_dimensions[get_column_letter(index)].width = column.width
+    
+    header_font = Font(bold=True, size=14)
+    sub_header_font = Font(bold=True, size=11)
+    col_header_font = Font(bold=True, size=10, color="FFFFFF")
+    col_header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    
+    if start and end:
+        subtitle = f"{report.title} - {period_label(start)} to {period_label(end)}"
+    elif start:
+        subtitle = f"{report.title} - from {period_label(start)}"
+    elif end:
+        subtitle = f"{report.title} - until {period_label(end)}"
+    else:
+        subtitle = f"{report.title} - All Periods"
+    
+    title_cell = WriteOnlyCell(ws, value="SUROVI AGRO INDUSTRIES LTD.")
+    title_cell.font = header_font
+    ws.append([title_cell])
+    subtitle_cell = WriteOnlyCell(ws, value=subtitle)
+    subtitle_cell.font = sub_header_font
+    ws.append([subtitle_cell])
+    ws.append([])
+    
+    header_cells = []
+    for column in report.columns:
+        cell = WriteOnlyCell(ws, value=column.header)
+        cell.font = col_header_font
+        cell.fill = col_header_fill
+        cell.alignment = Alignment(horizontal='center')
+        header_cells.append(cell)
+    ws.append(header_cells)
+    
+    rows = 0
+    for record in records:
+        row = []
+        for column in report.columns:
+            value = record[column.field]
+            if column.number_format:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.number_format = column.number_format
+                row.append(cell)
+            else:
+                row.append(value)
+        ws.append(row)
+        rows += 1
+    
+    wb.save(path)
+    return rows
@@ -0,0 +1,190 @@
+"""
+Result Cache
+============
+
+In-process cache for the dashboard and analytics endpoints, which recompute
+the same aggregates on every page load although the facts only change when
+an upload commits.
+
+Entries are keyed by endpoint + query parameters and expire after a TTL; the
+default MemoryBackend also evicts the least recently used entry beyond
+max_entries. Each entry is tagged with the (month, year) periods it reads,
+where None matches any month / year:
+
+    (11, 2025)      November 2025 only
+    (None, 2025)    any month of 2025
+    (None, None)    everything
+
+After an upload commits, invalidate_periods() drops exactly the entries
+whose tags match the periods it rewrote. Entries that also depend on the
+dimension tables (e.g. active product counts) are marked with
+dimensions=True and dropped whenever an upload added dimension members.
+
+The storage is pluggable: any object with get / set / delete / keys (see
+MemoryBackend) can be passed to ResultCache.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from app.config import settings
+
+
+Period = Tuple[Optional[int], Optional[int]]
+
+
+class CacheEntry:
+    """Cached value with its period tags and expiry time"""
+
+    def __init__(self, value: Any, periods: List[Period], dimensions: bool, expires_at: float):
+        self.value = value
+        self.periods = periods
+        self.dimensions = dimensions
+        self.expires_at = expires_at
+
+    def matches(self, month: int, year: int) -> bool:
+        """Whether the entry reads data of the given period"""
+        return any((m is None or m == month) and (y is None or y == year) for m, y in self.periods)
+
+
+class MemoryBackend:
+    """Thread-safe LRU dictionary of cache entries"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._entries)
+
+
+class ResultCache:
+    """TTL cache of endpoint results with period-based invalidation"""
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        # Bumped by every invalidation so results computed meanwhile are not stored
+        self.generation = 0
+        # Serializes the generation check + store against invalidations
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _lookup(self, endpoint: str, params: Dict[str, Any]) -> Tuple[Hashable, Optional[CacheEntry]]:
+        key = (endpoint, tuple(sorted(params.items())))
+        entry = self.backend.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            entry = None
+        return key, entry
+
+    def _store(self, key: Hashable, value: Any, periods: List[Period], dimensions: bool, generation: int) -> None:
+        with self._lock:
+            if generation == self.generation:
+                self.backend.set(key, CacheEntry(value, periods, dimensions, time.monotonic() + self.ttl))
+
+    def get_or_compute(self, endpoint: str, params: Dict[str, Any], periods: List[Period],
+                       compute: Callable[[], Any], dimensions: bool = False) -> Any:
+        """Cached result for endpoint + params, computing and storing it on a miss"""
+        if not self.enabled:
+            return compute()
+        
+        key, entry = self._lookup(endpoint, params)
+        if entry is not None:
+            return entry.value
+        
+        generation = self.generation
+        value = compute()
+        self._store(key, value, periods, dimensions, generation)
+        return value
+    
+    async def get_or_compute_async(self, endpoint: str, params: Dict[str, Any], periods: List[Period],
+                                   compute: Callable[[], Awaitable[Any]], dimensions: bool = False) -> Any:
+        """get_or_compute for a coroutine compute function"""
+        if not self.enabled:
+            return await compute()
+        
+        key, entry = self._lookup(endpoint, params)
+        if entry is not None:
+            return entry.value
+        
+        generation = self.generation
+        value = await compute()
+        self._store(key, value, periods, dimensions, generation)
+        return value
+
+    def cached(self, endpoint: str, periods: Callable[..., List[Period]], dimensions: bool = False):
+        """
+        Decorator for endpoints (plain or async) called with keyword arguments.
+        periods receives the endpoint's arguments (except db) and returns the
+        entry's period tags.
+        """
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(**kwargs):
+                    params = {name: value for name, value in kwargs.items() if name != 'db'}
+                    return await self.get_or_compute_async(endpoint, params, periods(**params),
+                                                           lambda: func(**kwargs), dimensions)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(**kwargs):
+                params = {name: value for name, value in kwargs.items() if name != 'db'}
+                return self.get_or_compute(endpoint, params, periods(**params),
+                                           lambda: func(**kwargs), dimensions)
+            return wrapper
+        return decorator
+
+    def invalidate_periods(self, periods: Iterable[Tuple[int, int]], dimensions: bool = False) -> int:
+        """
+        Drop entries reading any of the given (month, year) periods, and every
+        dimension-dependent entry if dimensions is set. Returns the number of
+        dropped entries.
+        """
+        periods = list(periods)
+        dropped = 0
+        with self._lock:
+            self.generation += 1
+            for key in self.backend.keys():
+                entry = self.backend.get(key)
+                if entry is None:
+                    continue
+                if (dimensions and entry.dimensions) or any(entry.matches(month, year) for month, year in periods):
+                    self.backend.delete(key)
+                    dropped += 1
+        return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in self.backend.keys():
+                self.backend.delete(key)
+
+
+result_cache = ResultCache(MemoryBackend(settings.RESULT_CACHE_MAX_ENTRIES), settings.RESULT_CACHE_TTL)
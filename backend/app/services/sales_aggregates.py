@@ -0,0 +1,71 @@
+"""
+Sales Aggregates
+================
+
+Maintains the fact_sales rollups used by the analytics endpoints:
+- agg_sales_zone_month:     zone x month
+- agg_sales_division_month: division x month
+- agg_sales_month:          month totals
+
+refresh_sales_aggregates() rebuilds the rows of the given time_ids with one
+DELETE and one INSERT ... SELECT per table, inside the caller's transaction,
+so the sales uploads keep the rollups of the periods they write in sync.
+backfill_sales_aggregates() fills in periods loaded by other means (e.g. the
+migration scripts) at startup.
+"""
+
+from typing import Iterable, List
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.orm import Session
+from app.models_star_schema import (
+    DimRegion, FactSales, AggSalesZoneMonth, AggSalesDivisionMonth, AggSalesMonth
+)
+
+
+# fact_sales measures summed into every aggregate table
+AGGREGATE_MEASURES = [
+    'sales_target', 'gross_sales', 'sales_return', 'net_sales',
+    'coll_target', 'total_collection', 'cash_collection', 'credit_collection', 'seed_collection',
+    'outstanding'
+]
+
+
+def _measure_sums() -> list:
+    sums = [func.sum(getattr(FactSales, measure)) for measure in AGGREGATE_MEASURES]
+    return sums + [func.count(FactSales.fact_id)]
+
+
+def _refresh_table(db: Session, model, group_columns: list, group_names: List[str], time_ids: List[int]) -> None:
+    db.execute(delete(model).where(model.time_id.in_(time_ids)))
+    
+    query = select(*group_columns, FactSales.time_id, *_measure_sums()).where(FactSales.time_id.in_(time_ids))
+    if group_columns:
+        query = query.join(DimRegion, DimRegion.region_id == FactSales.region_id)
+    query = query.group_by(*group_columns, FactSales.time_id)
+    
+    columns = group_names + ['time_id'] + AGGREGATE_MEASURES + ['region_count']
+    db.execute(insert(model).from_select(columns, query))
+
+
+def refresh_sales_aggregates(db: Session, time_ids: Iterable[int]) -> None:
+    """Rebuild the sales rollups of the given periods (the caller commits)"""
+    time_ids = sorted(set(time_ids))
+    if not time_ids:
+        return
+    
+    _refresh_table(db, AggSalesZoneMonth, [DimRegion.zone], ['zone'], time_ids)
+    _refresh_table(db, AggSalesDivisionMonth, [DimRegion.division, DimRegion.zone], ['division', 'zone'], time_ids)
+    _refresh_table(db, AggSalesMonth, [], [], time_ids)
+
+
+def backfill_sales_aggregates(db: Session) -> int:
+    """Build rollups for periods with sales facts but no aggregates. Returns the number of periods."""
+    missing = db.execute(
+        select(FactSales.time_id).distinct()
+        .where(FactSales.time_id.not_in(select(AggSalesMonth.time_id)))
+    ).scalars().all()
+    
+    if missing:
+        refresh_sales_aggregates(db, missing)
+        db.commit()
+    return len(missing)
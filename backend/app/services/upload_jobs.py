@@ -0,0 +1,142 @@
+"""
+Upload Jobs
+===========
+
+Runs uploaded workbooks through the file processors on a worker thread pool
+so the API can answer immediately with a job id. Each job gets its own
+database session; its status, progress (rows parsed / inserted) and final
+FileUploadResponse are kept in memory for the most recent
+settings.UPLOAD_JOB_HISTORY jobs. Only finished jobs are evicted, so a
+queued or running job can always be polled.
+
+Job status: queued -> running -> succeeded | failed
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.database import SessionLocal
+from app.schemas import FileUploadResponse
+from app.services.file_processor import process_upload
+
+
+def make_upload_response(success: bool, message: str, file_type: str, details: Dict[str, Any]) -> FileUploadResponse:
+    """FileUploadResponse for a processor result"""
+    total_records = details.get('fact_sales_inserted', 0) + details.get('fact_records_inserted', 0)
+    return FileUploadResponse(
+        success=success,
+        message=message,
+        file_type=file_type,
+        records_processed=total_records,
+        details=details
+    )
+
+
+class UploadJob:
+    """State of one background upload"""
+
+    def __init__(self, filename: str, file_type: str, options: Dict[str, Any]):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.file_type = file_type
+        self.options = options
+        self.status = 'queued'
+        self.rows_parsed = 0
+        self.rows_inserted = 0
+        self.message: Optional[str] = None
+        self.result: Optional[FileUploadResponse] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    def update_progress(self, rows_parsed: int, rows_inserted: int) -> None:
+        self.rows_parsed = rows_parsed
+        self.rows_inserted = rows_inserted
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'filename': self.filename,
+            'file_type': self.file_type,
+            'status': self.status,
+            'progress': {
+                'rows_parsed': self.rows_parsed,
+                'rows_inserted': self.rows_inserted
+            },
+            'message': self.message,
+            'result': self.result.model_dump() if self.result else None,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class UploadJobManager:
+    """Thread pool plus an in-memory registry of recent upload jobs"""
+
+    def __init__(self, max_workers: int, history: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload')
+        self.history = history
+        self._jobs: 'OrderedDict[str, UploadJob]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file_path: str, filename: str, file_type: str, **options) -> UploadJob:
+        """
+        Queue a spooled upload for processing. The job owns file_path and
+        deletes it when done.
+        """
+        job = UploadJob(filename, file_type, options)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._evict_finished()
+        
+        self.executor.submit(self._run, job, file_path)
+        return job
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[UploadJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _evict_finished(self) -> None:
+        """Drop the oldest finished jobs beyond the history size (caller holds the lock)"""
+        excess = len(self._jobs) - self.history
+        if excess <= 0:
+            return
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:excess]:
+            del self._jobs[job_id]
+
+    def _run(self, job: UploadJob, file_path: str) -> None:
+        job.status = 'running'
+        job.started_at = datetime.now()
+        db = SessionLocal()
+        try:
+            with open(file_path, 'rb') as file_content:
+                success, message, details = process_upload(
+                    file_content, job.filename, job.file_type, db,
+                    progress_callback=job.update_progress, **job.options
+                )
+            job.message = message
+            job.result = make_upload_response(success, message, job.file_type, details)
+            job.status = 'succeeded' if success else 'failed'
+        except Exception as e:
+            job.message = f"Error processing file: {str(e)}"
+            job.status = 'failed'
+        finally:
+            db.close()
+            os.remove(file_path)
+            job.finished_at = datetime.now()
+            with self._lock:
+                self._evict_finished()
+
+
+upload_jobs = UploadJobManager(settings.UPLOAD_WORKERS, settings.UPLOAD_JOB_HISTORY)
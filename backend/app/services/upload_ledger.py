@@ -0,0 +1,80 @@
+"""
+Upload Ledger
+=============
+
+Records every processed upload in upload_ledger (SHA-256 of the file,
+file type, resolved month/year, row counts) so that re-uploading an
+identical workbook for the same period can be answered without the
+delete/insert cycle.
+
+An upload is a duplicate when the most recent ledger entry that touched
+its facts has the same content hash and period. Product comparison files
+write the current and the previous year, so an entry for the year before
+or after also counts as touching the period.
+"""
+
+import hashlib
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session
+from app.models_star_schema import UploadLedger, get_month_name
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(file_content) -> str:
+    """SHA-256 hex digest of a file-like object, leaving it at position 0"""
+    digest = hashlib.sha256()
+    file_content.seek(0)
+    for chunk in iter(lambda: file_content.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file_content.seek(0)
+    return digest.hexdigest()
+
+
+def find_duplicate(db: Session, digest: str, file_type: str, month: int, year: int) -> Optional[UploadLedger]:
+    """Ledger entry of an identical upload whose facts are still current, if any"""
+    years = [year - 1, year, year + 1] if file_type == 'product_comparison' else [year]
+    latest = db.query(UploadLedger).filter(
+        UploadLedger.file_type == file_type,
+        UploadLedger.month == month,
+        UploadLedger.year.in_(years)
+    ).order_by(UploadLedger.upload_id.desc()).first()
+    
+    if latest and latest.content_hash == digest and latest.year == year:
+        return latest
+    return None
+
+
+def record_upload(db: Session, digest: str, file_type: str, filename: str, details: Dict[str, Any]) -> UploadLedger:
+    """Add a ledger entry for a processed upload (the caller commits)"""
+    entry = UploadLedger(
+        content_hash=digest,
+        file_type=file_type,
+        filename=filename,
+        month=details['month'],
+        year=details['year'],
+        records_processed=details.get('regions_processed', details.get('products_processed', 0)),
+        rows_deleted=details.get('deleted_records', 0),
+        rows_inserted=details.get('fact_sales_inserted', 0) + details.get('fact_records_inserted', 0)
+    )
+    db.add(entry)
+    return entry
+
+
+def duplicate_result(entry: UploadLedger) -> Dict[str, Any]:
+    """Processor-style details for a skipped duplicate upload"""
+    return {
+        'month': entry.month,
+        'year': entry.year,
+        'month_name': get_month_name(entry.month),
+        'skipped': True,
+        'duplicate_of': entry.upload_id,
+        'deleted_records': 0
+    }
+
+
+def duplicate_message(entry: UploadLedger) -> str:
+    """Result message for a skipped duplicate upload"""
+    return (f"Identical file already processed for {get_month_name(entry.month)} {entry.year} "
+            f"({entry.filename}, upload #{entry.upload_id}). No changes made.")
@@ -0,0 +1,232 @@
+"""
+Workbook Loader
+===============
+
+Parses an uploaded Excel workbook exactly once and exposes the header rows
+and data frames of every sheet the processors need, instead of re-opening
+the file with pd.read_excel for the period header, the value sheet, the
+fallback sheet and the volume sheet separately.
+
+.xlsx files are read with openpyxl in read-only mode (cell values only);
+anything openpyxl cannot open (legacy .xls) falls back to a single
+pd.read_excel call that loads all sheets at once.
+
+For very large uploads StreamingWorkbook offers the same interface without
+materializing sheets: rows are pulled from openpyxl's read-only iterator and
+handed out as DataFrames of at most chunk_size rows, so peak memory depends
+on the chunk size rather than the file size.
+"""
+
+from itertools import islice
+from zipfile import BadZipFile
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+
+SheetRef = Union[str, int]
+
+# Rows per DataFrame handed out by StreamingWorkbook.iter_frames
+STREAM_CHUNK_SIZE = 10000
+
+
+class WorkbookData:
+    """Cell values of the loaded sheets, keyed by sheet name in workbook order"""
+
+    def __init__(self, sheet_names: List[str], sheets: Dict[str, List[tuple]]):
+        self.sheet_names = sheet_names
+        self.sheets = sheets
+
+    def sheet_name(self, sheet: SheetRef) -> str:
+        """Resolve a sheet name or position to a name, KeyError if not loaded"""
+        name = self.sheet_names[sheet] if isinstance(sheet, int) and sheet < len(self.sheet_names) else sheet
+        if name not in self.sheets:
+            raise KeyError(f"Worksheet {sheet} not found")
+        return name
+
+    def has_sheet(self, sheet: SheetRef) -> bool:
+        try:
+            self.sheet_name(sheet)
+            return True
+        except KeyError:
+            return False
+
+    def rows(self, sheet: SheetRef = 0) -> List[tuple]:
+        """All rows of a sheet as tuples of cell values"""
+        return self.sheets[self.sheet_name(sheet)]
+
+    def header_rows(self, sheet: SheetRef = 0, nrows: int = 5) -> List[tuple]:
+        """First rows of a sheet (company name, period, ...)"""
+        return self.rows(sheet)[:nrows]
+
+    def frame(self, sheet: SheetRef = 0, skiprows: int = 0, header: Optional[int] = None) -> pd.DataFrame:
+        """
+        DataFrame of a sheet with the same rows and cells as
+        pd.read_excel(sheet_name=sheet, skiprows=skiprows, header=header).
+        With header=0 the first remaining row is consumed as the header;
+        columns are always labelled by position.
+        """
+        rows = self.rows(sheet)[skiprows:]
+        if header is not None:
+            rows = rows[header + 1:]
+        return pd.DataFrame(rows)
+
+    def iter_frames(self, sheet: SheetRef = 0, skiprows: int = 0, header: Optional[int] = None,
+                    chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """The whole sheet as a single frame (see StreamingWorkbook.iter_frames)"""
+        yield self.frame(sheet, skiprows, header)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StreamingWorkbook:
+    """
+    Read-only openpyxl workbook that yields sheet data in bounded chunks.
+    Each iteration re-reads the sheet from the start, so header rows and
+    data chunks can be requested independently.
+    """
+
+    def __init__(self, file_content):
+        file_content.seek(0)
+        self.wb = load_workbook(file_content, read_only=True, data_only=True)
+        self.sheet_names = self.wb.sheetnames
+
+    def sheet_name(self, sheet: SheetRef) -> str:
+        """Resolve a sheet name or position to a name, KeyError if missing"""
+        name = self.sheet_names[sheet] if isinstance(sheet, int) and sheet < len(self.sheet_names) else sheet
+        if name not in self.sheet_names:
+            raise KeyError(f"Worksheet {sheet} not found")
+        return name
+
+    def has_sheet(self, sheet: SheetRef) -> bool:
+        try:
+            self.sheet_name(sheet)
+            return True
+        except KeyError:
+            return False
+
+    def iter_rows(self, sheet: SheetRef = 0) -> Iterator[tuple]:
+        return self.wb[self.sheet_name(sheet)].iter_rows(values_only=True)
+
+    def header_rows(self, sheet: SheetRef = 0, nrows: int = 5) -> List[tuple]:
+        """First rows of a sheet (company name, period, ...)"""
+        return list(islice(self.iter_rows(sheet), nrows))
+
+    def iter_frames(self, sheet: SheetRef = 0, skiprows: int = 0, header: Optional[int] = None,
+                    chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Sheet data as consecutive DataFrames of at most chunk_size rows, with
+        the same skiprows/header handling as WorkbookData.frame. Columns are
+        labelled by position and chunks may differ in width.
+        """
+        rows = self.iter_rows(sheet)
+        if header is not None:
+            skiprows += header + 1
+        rows = islice(rows, skiprows, None)
+        
+        chunk_size = chunk_size or STREAM_CHUNK_SIZE
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield pd.DataFrame(chunk)
+
+    def close(self) -> None:
+        self.wb.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _trim_trailing_empty_rows(rows: List[tuple]) -> List[tuple]:
+    """Drop trailing rows with no values, as pd.read_excel does"""
+    end = len(rows)
+    while end and all(cell is None for cell in rows[end - 1]):
+        end -= 1
+    return rows[:end]
+
+
+def load_workbook_data(file_content, sheets: Optional[Sequence[SheetRef]] = None) -> WorkbookData:
+    """
+    Parse the workbook once and keep the requested sheets (all sheets when
+    sheets is None). Requested sheets that do not exist are skipped.
+    """
+    file_content.seek(0)
+    try:
+        wb = load_workbook(file_content, read_only=True, data_only=True)
+    except (InvalidFileException, BadZipFile):
+        file_content.seek(0)
+        return _load_with_pandas(file_content, sheets)
+    
+    try:
+        sheet_names = wb.sheetnames
+        wanted = _wanted_sheet_names(sheet_names, sheets)
+        loaded = {
+            name: _trim_trailing_empty_rows(list(wb[name].iter_rows(values_only=True)))
+            for name in sheet_names if name in wanted
+        }
+    finally:
+        wb.close()
+        file_content.seek(0)
+    
+    return WorkbookData(sheet_names, loaded)
+
+
+def open_workbook(file_content, sheets: Optional[Sequence[SheetRef]] = None, streaming: bool = False):
+    """Open an upload fully parsed (WorkbookData) or for chunked streaming (StreamingWorkbook)"""
+    if streaming:
+        return StreamingWorkbook(file_content)
+    return load_workbook_data(file_content, sheets)
+
+
+def read_header_rows(file_content, sheet: SheetRef = 0, nrows: int = 5) -> List[tuple]:
+    """
+    First rows of one sheet without loading the rest of the workbook
+    ([] if the sheet does not exist).
+    """
+    try:
+        with StreamingWorkbook(file_content) as workbook:
+            rows = workbook.header_rows(sheet, nrows) if workbook.has_sheet(sheet) else []
+    except (InvalidFileException, BadZipFile):
+        workbook = load_workbook_data(file_content, [sheet])
+        rows = workbook.header_rows(sheet, nrows) if workbook.has_sheet(sheet) else []
+    file_content.seek(0)
+    return rows
+
+
+def _wanted_sheet_names(sheet_names: List[str], sheets: Optional[Sequence[SheetRef]]) -> set:
+    if sheets is None:
+        return set(sheet_names)
+    wanted = set()
+    for sheet in sheets:
+        if isinstance(sheet, int):
+            if sheet < len(sheet_names):
+                wanted.add(sheet_names[sheet])
+        elif sheet in sheet_names:
+            wanted.add(sheet)
+    return wanted
+
+
+def _load_with_pandas(file_content, sheets: Optional[Sequence[SheetRef]]) -> WorkbookData:
+    """Fallback for formats openpyxl cannot read: one pd.read_excel over all sheets"""
+    frames = pd.read_excel(file_content, sheet_name=None, header=None)
+    file_content.seek(0)
+    
+    sheet_names = list(frames)
+    wanted = _wanted_sheet_names(sheet_names, sheets)
+    loaded = {
+        name: [tuple(None if pd.isna(v) else v for v in row) for row in frames[name].itertuples(index=False)]
+        for name in sheet_names if name in wanted
+    }
+    return WorkbookData(sheet_names, loaded)